@@ -2,22 +2,34 @@ from __future__ import annotations
 
 import base64
 import resource
+import secrets
+import threading
 from io import BytesIO
 from pathlib import Path
 
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile, status
+from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
 from PIL import Image
 
 from app.core.config import settings
-from app.services.image_pipeline.pipeline import render_paint_by_numbers
-from app.services.image_pipeline.palette import build_palette_metadata, render_palette_pdf
+from app.services.admission import AdmissionRejected, admission, estimate_job_cost
+from app.services.image_pipeline.paints import PaintInventory, load_paint_inventory
+from app.services.image_pipeline.pipeline import (
+    COLOR_SPACES,
+    OUTPUTS,
+    PALETTE_MODES,
+    SEGMENTATIONS,
+    run_pipeline,
+)
+from app.services.image_pipeline.region_model import build_region_model
+from app.services.ingest import CHUNK_SIZE, UploadIngest
+from app.services.load import load_tracker
+from app.services.profiling import profile_request, should_profile
+from app.services.results import result_store
 
 
 router = APIRouter(prefix="/generate", tags=["generate"])
 
-ALLOWED_CONTENT_TYPES = {"image/png", "image/jpeg", "image/jpg"}
-
-
 def _sanitize_filename(filename: str | None) -> str:
     stem = Path(filename or "output").stem
     if not stem:
@@ -25,6 +37,56 @@ def _sanitize_filename(filename: str | None) -> str:
     return f"{stem}_paint_by_numbers.png"
 
 
+def _client_id(request: Request) -> str:
+    """Admission key: the peer address, or ``X-Client-Id`` when set by a trusted proxy."""
+
+    peer = request.client.host if request.client else "anonymous"
+    if peer in settings.admission_trusted_proxies:
+        client_id = request.headers.get("x-client-id", "").strip()
+        if client_id:
+            return client_id
+    return peer
+
+
+def _profile_requested(request: Request) -> bool:
+    """``X-Profile`` forces a capture, but only alongside a valid ``X-Ops-Token``."""
+
+    if not settings.ops_token or request.headers.get("x-profile") != "1":
+        return False
+    token = request.headers.get("x-ops-token")
+    return bool(token) and secrets.compare_digest(token, settings.ops_token)
+
+
+def _paint_inventory(palette_mode: str, paint_codes: list[str]) -> PaintInventory | None:
+    """The inventory a paint palette mode draws from, narrowed to ``paint_codes`` if given."""
+
+    if palette_mode == "kmeans":
+        return None
+    inventory = load_paint_inventory(settings.paint_inventory_path)
+    return inventory.subset(paint_codes) if paint_codes else inventory
+
+
+_buffers = threading.local()
+
+
+def _thread_buffer(name: str) -> BytesIO:
+    """A rewound ``BytesIO`` kept per worker thread, so encoding reuses its allocation."""
+
+    buffer = getattr(_buffers, name, None)
+    if buffer is None:
+        buffer = BytesIO()
+        setattr(_buffers, name, buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def _encode_png(image: Image.Image) -> str:
+    buffer = _thread_buffer("png")
+    image.save(buffer, format="PNG")
+    with buffer.getbuffer() as view, view[: buffer.tell()] as data:
+        return base64.b64encode(data).decode("ascii")
+
+
 MAX_FILE_BYTES = settings.max_upload_bytes
 MIN_COLORS = settings.min_colors
 MAX_COLORS = settings.max_colors
@@ -32,17 +94,25 @@ MIN_WIDTH = settings.min_width
 MAX_WIDTH = settings.max_width
 MIN_REGION_SIZE = 50
 MAX_REGION_SIZE = 5000
+MAX_PREFILTER_STRENGTH = settings.max_prefilter_strength
 
 
 @router.post("/", summary="Generate a paint-by-numbers PNG with palette legend")
 async def generate_image(
+    request: Request,
     file: UploadFile = File(...),
     num_colors: int = Form(settings.default_num_colors),
     max_width: int = Form(settings.default_max_width),
     min_region_size: int = Form(settings.min_region_size),
+    max_regions: int | None = Form(None),
+    prefilter_strength: int = Form(settings.default_prefilter_strength),
+    editable: bool = Form(False),
+    outputs: str = Form(",".join(OUTPUTS)),
+    palette_mode: str = Form("kmeans"),
+    paints: str = Form(""),
+    segmentation: str = Form("pixels"),
+    color_space: str = Form("rgb"),
 ):
-    if file.content_type not in ALLOWED_CONTENT_TYPES:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported file type")
     if num_colors < MIN_COLORS or num_colors > MAX_COLORS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -58,69 +128,225 @@ async def generate_image(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"min_region_size must be between {MIN_REGION_SIZE} and {MAX_REGION_SIZE}",
         )
+    if max_regions is not None and max_regions < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="max_regions must be a positive integer",
+        )
+    if prefilter_strength < 0 or prefilter_strength > MAX_PREFILTER_STRENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"prefilter_strength must be between 0 and {MAX_PREFILTER_STRENGTH}",
+        )
+    requested_outputs = [name.strip() for name in outputs.split(",") if name.strip()]
+    if not requested_outputs or not set(requested_outputs) <= set(OUTPUTS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"outputs must be a comma-separated subset of {', '.join(OUTPUTS)}",
+        )
+    if editable and not {"image", "preview"} <= set(requested_outputs):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="editable results require the image and preview outputs",
+        )
+
+    if palette_mode not in PALETTE_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"palette_mode must be one of {', '.join(PALETTE_MODES)}",
+        )
+    if segmentation not in SEGMENTATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"segmentation must be one of {', '.join(SEGMENTATIONS)}",
+        )
+    if color_space not in COLOR_SPACES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"color_space must be one of {', '.join(COLOR_SPACES)}",
+        )
+    paint_codes = [code.strip() for code in paints.split(",") if code.strip()]
+    if palette_mode == "inventory" and not MIN_COLORS <= len(paint_codes) <= MAX_COLORS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"inventory mode needs between {MIN_COLORS} and {MAX_COLORS} paint codes",
+        )
+    try:
+        _paint_inventory(palette_mode, paint_codes)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
-    contents = await file.read(MAX_FILE_BYTES + 1)
-    if len(contents) == 0:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File is empty")
-    if len(contents) > MAX_FILE_BYTES:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File too large")
+    # Starlette has already spooled the multipart body; read it back in chunks so a bad
+    # header is rejected after the first one, and decode from the spooled file itself.
+    ingest = UploadIngest(MAX_FILE_BYTES, settings.max_input_pixels)
+    try:
+        while chunk := await file.read(CHUNK_SIZE):
+            ingest.feed(chunk)
+        header = ingest.finish()
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
-    # Normalize incoming images (JPEG/PNG) to PNG to handle edge cases consistently
+    profile = should_profile(_profile_requested(request))
+    await file.seek(0)
+    source = await file.read() if profile else b""  # only captures keep a copy of the input
+    await file.seek(0)
     try:
-        input_image = Image.open(BytesIO(contents))
+        input_image = Image.open(file.file, formats=[header.format])
     except Exception as exc:  # pragma: no cover - PIL raises many subclasses
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid image file") from exc
 
+    colors = len(paint_codes) if palette_mode == "inventory" else num_colors
+    cost = estimate_job_cost(input_image.width, input_image.height, max_width, colors)
+    try:
+        async with admission.slot(_client_id(request), cost):
+            with load_tracker.timed():
+                response = await run_in_threadpool(
+                    _generate,
+                    input_image,
+                    file.filename,
+                    source=source,
+                    profile=profile,
+                    num_colors=num_colors,
+                    max_width=max_width,
+                    min_region_size=min_region_size,
+                    max_regions=max_regions,
+                    prefilter_strength=prefilter_strength,
+                    editable=editable,
+                    outputs=requested_outputs,
+                    palette_mode=palette_mode,
+                    paint_codes=paint_codes,
+                    segmentation=segmentation,
+                    color_space=color_space,
+                )
+    except AdmissionRejected as exc:
+        if exc.retry_after is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=exc.reason) from exc
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=exc.reason,
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
+    response["meta"]["content_hash"] = ingest.sha256
+    return response
+
+
+def _generate(
+    input_image: Image.Image,
+    filename: str | None,
+    *,
+    source: bytes,
+    profile: bool,
+    **params,
+) -> dict[str, object]:
+    """Build the response, under cProfile when ``profile`` is set and no capture is running."""
+
+    with profile_request(profile, params=params, source=source) as capture:
+        response = _build_response(input_image, filename, concurrent=capture is None, **params)
+    if capture is not None:
+        response["meta"]["profile_id"] = capture.capture_id
+    return response
+
+
+def _build_response(
+    input_image: Image.Image,
+    filename: str | None,
+    *,
+    concurrent: bool,
+    num_colors: int,
+    max_width: int,
+    min_region_size: int,
+    max_regions: int | None,
+    prefilter_strength: int,
+    editable: bool,
+    outputs: list[str],
+    palette_mode: str,
+    paint_codes: list[str],
+    segmentation: str,
+    color_space: str,
+) -> dict[str, object]:
+    """Run the pipeline and build the response body; blocking, so called off the event loop."""
+
     if input_image.mode not in ("RGB", "RGBA"):
         input_image = input_image.convert("RGB")
 
-    normalized_buffer = BytesIO()
+    normalized_buffer = _thread_buffer("input")
     input_image.save(normalized_buffer, format="PNG")
+    normalized_buffer.truncate()
     normalized_buffer.seek(0)
 
-    final_image, preview_image, palette, _ = render_paint_by_numbers(
+    result = run_pipeline(
         normalized_buffer,
         num_colors=num_colors,
         max_width=max_width,
         min_region_size=min_region_size,
+        max_regions=max_regions,
+        prefilter_strength=prefilter_strength,
+        line_width=settings.outline_line_width,
+        number_spacing_ratio=settings.number_spacing_ratio,
+        palette_mode=palette_mode,
+        inventory=_paint_inventory(palette_mode, paint_codes),
+        segmentation=segmentation,
+        superpixel_size=settings.superpixel_size,
+        color_space=color_space,
+        outputs=outputs,
+        concurrent=concurrent,
     )
-    palette_metadata = build_palette_metadata(palette)
-
-    png_buffer = BytesIO()
-    final_image.save(png_buffer, format="PNG")
-    png_b64 = base64.b64encode(png_buffer.getvalue()).decode("ascii")
-
-    legend_pdf_bytes = render_palette_pdf(palette_metadata)
-    legend_b64 = base64.b64encode(legend_pdf_bytes).decode("ascii")
 
-    preview_buffer = BytesIO()
-    preview_image.save(preview_buffer, format="PNG")
-    preview_b64 = base64.b64encode(preview_buffer.getvalue()).decode("ascii")
+    result_id = None
+    if editable:
+        result_id = result_store.put(
+            build_region_model(
+                result.label_img,
+                result.palette,
+                result.image,
+                result.preview,
+                min_region_size=result.min_region_size,
+                line_width=settings.outline_line_width,
+                layout=result.layout,
+            )
+        )
 
-    mem_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    stem = Path(filename or "output").stem
+    response: dict[str, object] = {"palette": result.palette_metadata}
 
-    return {
-        "image": {
-            "filename": _sanitize_filename(file.filename),
+    if result.image is not None:
+        response["image"] = {
+            "filename": _sanitize_filename(filename),
             "content_type": "image/png",
-            "width": final_image.width,
-            "height": final_image.height,
-            "data": png_b64,
-        },
-        "preview": {
-            "filename": f"{Path(file.filename or 'output').stem}_painted_preview.png",
+            "width": result.image.width,
+            "height": result.image.height,
+            "data": _encode_png(result.image),
+        }
+
+    if result.preview is not None:
+        response["preview"] = {
+            "filename": f"{stem}_painted_preview.png",
             "content_type": "image/png",
-            "width": preview_image.width,
-            "height": preview_image.height,
-            "data": preview_b64,
-        },
-        "palette": palette_metadata,
-        "legend": {
-            "filename": f"{Path(file.filename or 'output').stem}_palette_legend.pdf",
+            "width": result.preview.width,
+            "height": result.preview.height,
+            "data": _encode_png(result.preview),
+        }
+
+    if result.legend is not None:
+        response["legend"] = {
+            "filename": f"{stem}_palette_legend.pdf",
             "content_type": "application/pdf",
-            "data": legend_b64,
-        },
-        "meta": {
-            "memory_mb": round(mem_mb, 2),
-        },
+            "data": base64.b64encode(result.legend).decode("ascii"),
+        }
+
+    mem_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    response["meta"] = {
+        "memory_mb": round(mem_mb, 2),
+        "prefilter_strength": prefilter_strength,
+        "min_region_size": result.min_region_size,
     }
+    if result.region_stats is not None:
+        response["meta"]["components"] = {
+            "quantized": result.region_stats.components,
+            "merged": result.region_stats.merged,
+        }
+        if result.region_stats.regions is not None:
+            response["meta"]["regions"] = result.region_stats.regions
+    if result_id is not None:
+        response["result_id"] = result_id
+    return response
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+
+from app.core.config import settings
+from app.services.admission import admission
+
+
+def require_ops_token(x_ops_token: str | None = Header(None)) -> None:
+    """Hide /ops unless ``PBN_OPS_TOKEN`` is configured and sent as ``X-Ops-Token``."""
+
+    if not settings.ops_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_ops_token or not secrets.compare_digest(x_ops_token, settings.ops_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid ops token")
+
+
+router = APIRouter(prefix="/ops", tags=["ops"], dependencies=[Depends(require_ops_token)])
+
+
+@router.get("/admission", summary="Admission queue state and per-client usage")
+async def admission_state() -> dict[str, object]:
+    return admission.snapshot()
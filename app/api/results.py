@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import base64
+from io import BytesIO
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, status
+from PIL import Image
+from pydantic import BaseModel
+
+from app.services.image_pipeline.region_model import (
+    Box,
+    merge_regions,
+    recolor_region,
+)
+from app.services.results import result_store
+
+
+router = APIRouter(prefix="/results", tags=["results"])
+
+
+class RegionEdit(BaseModel):
+    """Merge the region under ``(x, y)`` into the one under ``(into_x, into_y)``, or
+    give it palette number ``color``."""
+
+    op: Literal["merge", "recolor"]
+    x: int
+    y: int
+    into_x: int | None = None
+    into_y: int | None = None
+    color: int | None = None
+
+
+def _encode_patch(image: Image.Image, box: Box | None) -> dict[str, object] | None:
+    if box is None:
+        return None
+    y0, x0, y1, x1 = box
+    buffer = BytesIO()
+    image.crop((x0, y0, x1, y1)).save(buffer, format="PNG")
+    return {
+        "x": x0,
+        "y": y0,
+        "width": x1 - x0,
+        "height": y1 - y0,
+        "content_type": "image/png",
+        "data": base64.b64encode(buffer.getvalue()).decode("ascii"),
+    }
+
+
+@router.post("/{result_id}/edits", summary="Merge or recolor a region and return changed patches")
+async def edit_result(result_id: str, edit: RegionEdit):
+    model = result_store.get(result_id)
+    if model is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown result")
+
+    try:
+        component = model.component_at(edit.x, edit.y)
+        if edit.op == "merge":
+            if edit.into_x is None or edit.into_y is None:
+                raise ValueError("merge requires into_x and into_y")
+            target = model.component_at(edit.into_x, edit.into_y)
+            result = merge_regions(model, component, target)
+        else:
+            if edit.color is None:
+                raise ValueError("recolor requires color")
+            result = recolor_region(model, component, edit.color - 1)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+    return {
+        "result_id": result_id,
+        "image": _encode_patch(model.page, result.page_box),
+        "preview": _encode_patch(model.preview, result.preview_box),
+        "meta": {"regions": model.region_count},
+    }
@@ -22,6 +22,11 @@ class Settings(BaseSettings):
     default_max_width: int = Field(2550, description="Default width cap for uploaded images")
     default_num_colors: int = Field(10, description="Default number of paint colors")
     min_region_size: int = Field(300, description="Minimum region size before merging")
+    default_prefilter_strength: int = Field(0, description="Default median pre-filter passes")
+    max_prefilter_strength: int = Field(3, description="Maximum allowed prefilter_strength value")
+    outline_line_width: int = Field(
+        1, ge=1, description="Outline thickness; each step adds 1 px a side"
+    )
 
     min_colors: int = Field(3, description="Minimum allowed num_colors value")
     max_colors: int = Field(16, description="Maximum allowed num_colors value")
@@ -29,7 +34,64 @@ class Settings(BaseSettings):
     min_width: int = Field(400, description="Minimum allowed max_width value")
     max_width: int = Field(4000, description="Maximum allowed max_width value")
 
+    superpixel_size: int = Field(
+        12, ge=2, description="Superpixel width in pixels for segmentation=superpixels"
+    )
+    paint_inventory_path: str | None = Field(
+        None, description="JSON paint inventory for the paint palette modes (bundled if unset)"
+    )
+
     max_upload_bytes: int = Field(15 * 1024 * 1024, description="Upload size limit in bytes")
+    max_input_pixels: int = Field(
+        50_000_000, ge=1, description="Largest upload (width x height) accepted before decoding"
+    )
+
+    number_spacing_ratio: float = Field(
+        0.2, ge=0, description="Repeat numbers in large regions every this fraction of page width"
+    )
+
+    result_store_max_entries: int = Field(4, description="Editable results kept in memory")
+    buffer_pool_max_bytes: int = Field(
+        256 * 1024 * 1024, ge=0, description="Free scratch arrays kept for reuse; 0 disables"
+    )
+
+    admission_max_concurrent_jobs: int = Field(2, description="Pipeline jobs running at once")
+    admission_max_queued: int = Field(32, description="Waiting jobs allowed across all clients")
+    admission_client_max_concurrent: int = Field(1, description="Running jobs allowed per client")
+    admission_client_max_cost: float = Field(
+        200.0, description="Queued plus running job cost allowed per client (megapixels x colors)"
+    )
+    admission_client_max_queued: int = Field(4, description="Waiting jobs allowed per client")
+    admission_cost_per_second: float = Field(
+        2.0, description="Approximate job cost processed per second, used for Retry-After"
+    )
+    admission_client_weights: dict[str, float] = Field(
+        default_factory=dict, description="Fair-share weight per client id (default 1.0)"
+    )
+    admission_trusted_proxies: list[str] = Field(
+        default_factory=list, description="Peer addresses allowed to set the X-Client-Id header"
+    )
+    ready_max_in_flight: int | None = Field(
+        None, ge=1, description="Running jobs at which /ready reports saturated (default: all slots)"
+    )
+    ready_max_queued: int = Field(0, ge=0, description="Queued jobs tolerated before saturated")
+    ready_max_p95_seconds: float | None = Field(
+        None, gt=0, description="Recent p95 pipeline latency above which /ready is saturated"
+    )
+    ready_max_rss_mb: float | None = Field(
+        None, gt=0, description="Resident memory above which /ready is saturated"
+    )
+    ready_latency_window: int = Field(200, ge=1, description="Recent jobs kept for latency stats")
+    ops_token: str | None = Field(None, description="Token for /ops routes; unset disables them")
+
+    profiling_enabled: bool = Field(False, description="Allow per-request cProfile captures")
+    profiling_sample_rate: float = Field(
+        0.0, ge=0, le=1, description="Fraction of requests profiled when profiling is enabled"
+    )
+    profiling_dir: str = Field("profiles", description="Directory that receives profile captures")
+    profiling_max_bytes: int = Field(
+        200 * 1024 * 1024, ge=0, description="Disk budget for captures; oldest are deleted first"
+    )
 
 
 settings = Settings()
@@ -1,13 +1,19 @@
 import os
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.generate import router as generate_router
+from app.api.ops import router as ops_router
+from app.api.results import router as results_router
+from app.core.config import settings
+from app.services.image_pipeline.buffers import buffer_pool
+from app.services.load import load_tracker
 
 
 def create_app() -> FastAPI:
     """Application factory so tests can instantiate the API easily."""
     app = FastAPI(title="Paint-By-Number Engine")
+    buffer_pool.configure(settings.buffer_pool_max_bytes)
 
     # Allow specific origins for the frontend; defaults cover Render static + local dev.
     default_origins = [
@@ -35,7 +41,18 @@ def create_app() -> FastAPI:
     async def health_check() -> dict[str, str]:
         return {"status": "ok"}
 
+    @app.get("/ready")
+    async def readiness_check(response: Response) -> dict[str, object]:
+        """Load snapshot; 503 while saturated so load balancers route elsewhere."""
+
+        state = load_tracker.snapshot()
+        if state["status"] != "ready":
+            response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return state
+
     app.include_router(generate_router)
+    app.include_router(results_router)
+    app.include_router(ops_router)
 
     return app
 
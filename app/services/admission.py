@@ -0,0 +1,228 @@
+"""Cost-aware admission control with weighted fair queuing across clients."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+from app.core.config import settings
+
+MAX_IDLE_CLIENTS = 1024
+
+
+class AdmissionRejected(Exception):
+    """Raised when a job cannot be queued; ``retry_after`` is in seconds.
+
+    ``retry_after`` is ``None`` when retrying cannot help because the job alone costs
+    more than a client's whole quota.
+    """
+
+    def __init__(self, reason: str, retry_after: int | None) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def estimate_job_cost(width: int, height: int, max_width: int, num_colors: int) -> float:
+    """Relative job cost: resized megapixels times clusters.
+
+    K-means and region work both scale with the two.
+    """
+
+    if width > max_width:
+        height = max(1, int(round(height * max_width / float(width))))
+        width = max_width
+    return width * height / 1_000_000 * num_colors
+
+
+@dataclass
+class ClientUsage:
+    running: int = 0
+    queued: int = 0
+    cost_in_flight: float = 0.0  # running + queued
+    completed: int = 0
+    cost_completed: float = 0.0
+    last_finish_tag: float = 0.0
+
+
+@dataclass
+class _Job:
+    client: str
+    cost: float
+    start_tag: float
+    finish_tag: float
+    enqueued_at: float
+    future: asyncio.Future = field(repr=False)
+
+
+class AdmissionController:
+    """Admit jobs under per-client quotas and dispatch them in weighted fair order.
+
+    Each job gets start-time fair queuing tags: ``start = max(virtual_time,
+    client's previous finish)`` and ``finish = start + cost / weight``. Whenever a
+    worker slot frees up, the queued job with the smallest finish tag whose client
+    is under its concurrency limit runs next, so a client submitting many large
+    jobs only delays its own later jobs. All methods must run on the event loop.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrent_jobs: int,
+        max_queued: int,
+        client_max_concurrent: int,
+        client_max_cost: float,
+        client_max_queued: int,
+        cost_per_second: float,
+        weights: dict[str, float] | None = None,
+    ) -> None:
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.max_queued = max_queued
+        self.client_max_concurrent = client_max_concurrent
+        self.client_max_cost = client_max_cost
+        self.client_max_queued = client_max_queued
+        self.cost_per_second = cost_per_second
+        self.weights = weights or {}
+        self.virtual_time = 0.0
+        self.running = 0
+        self.clients: dict[str, ClientUsage] = {}
+        self._queue: list[_Job] = []
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def _retry_after(self, pending_cost: float) -> int:
+        return max(1, math.ceil(pending_cost / self.cost_per_second))
+
+    def _admit(self, client: str, cost: float) -> ClientUsage:
+        if cost > self.client_max_cost:
+            raise AdmissionRejected("job exceeds the per-client cost quota", None)
+        if len(self._queue) >= self.max_queued:
+            queued_cost = sum(job.cost for job in self._queue)
+            raise AdmissionRejected("server busy", self._retry_after(queued_cost))
+        usage = self.clients.setdefault(client, ClientUsage())
+        if usage.queued >= self.client_max_queued:
+            raise AdmissionRejected("too many queued jobs", self._retry_after(usage.cost_in_flight))
+        if usage.cost_in_flight + cost > self.client_max_cost:
+            raise AdmissionRejected("cost quota exceeded", self._retry_after(usage.cost_in_flight))
+        return usage
+
+    def _dispatch(self) -> None:
+        while self.running < self.max_concurrent_jobs:
+            eligible = [
+                job
+                for job in self._queue
+                if self.clients[job.client].running < self.client_max_concurrent
+            ]
+            if not eligible:
+                return
+            job = min(eligible, key=lambda item: (item.finish_tag, item.enqueued_at))
+            self._queue.remove(job)
+            usage = self.clients[job.client]
+            usage.queued -= 1
+            usage.running += 1
+            self.running += 1
+            self.virtual_time = max(self.virtual_time, job.start_tag)
+            job.future.set_result(None)
+
+    async def acquire(self, client: str, cost: float) -> None:
+        """Wait for a worker slot, or raise ``AdmissionRejected`` if over quota."""
+
+        usage = self._admit(client, cost)
+        start = max(self.virtual_time, usage.last_finish_tag)
+        finish = start + cost / self.weights.get(client, 1.0)
+        usage.last_finish_tag = finish
+        usage.queued += 1
+        usage.cost_in_flight += cost
+
+        job = _Job(
+            client=client,
+            cost=cost,
+            start_tag=start,
+            finish_tag=finish,
+            enqueued_at=time.monotonic(),
+            future=asyncio.get_running_loop().create_future(),
+        )
+        self._queue.append(job)
+        self._dispatch()
+
+        try:
+            await job.future
+        except asyncio.CancelledError:
+            if job in self._queue:
+                self._queue.remove(job)
+                usage.queued -= 1
+                usage.cost_in_flight -= cost
+            else:
+                self.release(client, cost, completed=False)
+            raise
+
+    def release(self, client: str, cost: float, *, completed: bool = True) -> None:
+        usage = self.clients[client]
+        usage.running -= 1
+        usage.cost_in_flight -= cost
+        if completed:
+            usage.completed += 1
+            usage.cost_completed += cost
+        self.running -= 1
+        self._prune()
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, client: str, cost: float) -> AsyncIterator[None]:
+        await self.acquire(client, cost)
+        try:
+            yield
+        finally:
+            self.release(client, cost)
+
+    def _prune(self) -> None:
+        if len(self.clients) <= MAX_IDLE_CLIENTS:
+            return
+        for client, usage in list(self.clients.items()):
+            if not usage.running and not usage.queued:
+                del self.clients[client]
+
+    def snapshot(self) -> dict[str, object]:
+        now = time.monotonic()
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "max_concurrent_jobs": self.max_concurrent_jobs,
+            "virtual_time": round(self.virtual_time, 3),
+            "queue": [
+                {
+                    "client": job.client,
+                    "cost": round(job.cost, 3),
+                    "finish_tag": round(job.finish_tag, 3),
+                    "waiting_s": round(now - job.enqueued_at, 3),
+                }
+                for job in sorted(self._queue, key=lambda item: item.finish_tag)
+            ],
+            "clients": {
+                client: {
+                    "running": usage.running,
+                    "queued": usage.queued,
+                    "cost_in_flight": round(usage.cost_in_flight, 3),
+                    "completed": usage.completed,
+                    "cost_completed": round(usage.cost_completed, 3),
+                }
+                for client, usage in self.clients.items()
+            },
+        }
+
+
+admission = AdmissionController(
+    max_concurrent_jobs=settings.admission_max_concurrent_jobs,
+    max_queued=settings.admission_max_queued,
+    client_max_concurrent=settings.admission_client_max_concurrent,
+    client_max_cost=settings.admission_client_max_cost,
+    client_max_queued=settings.admission_client_max_queued,
+    cost_per_second=settings.admission_cost_per_second,
+    weights=settings.admission_client_weights,
+)
@@ -0,0 +1,95 @@
+"""Per-process pool of scratch arrays reused across pipeline runs."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator
+
+import numpy as np
+
+DEFAULT_POOL_BYTES = 256 * 1024 * 1024
+
+BufferKey = tuple[tuple[int, ...], str]
+
+
+class BufferPool:
+    """Free arrays keyed by ``(shape, dtype)``, capped at ``max_bytes``.
+
+    Stages borrow scratch arrays that never leave the stage (visited masks, border
+    scratch, superpixel distances) instead of allocating fresh full-size arrays on
+    every request, which keeps a long-running worker's heap from fragmenting. When
+    the free arrays exceed ``max_bytes`` the least recently returned shapes are
+    dropped first. Borrowed arrays are not cleared.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._free: OrderedDict[BufferKey, list[np.ndarray]] = OrderedDict()
+        self._pooled_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, max_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def take(self, shape: tuple[int, ...], dtype: np.dtype | type) -> np.ndarray:
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                array = free.pop()
+                if not free:
+                    del self._free[key]
+                self._pooled_bytes -= array.nbytes
+                self.hits += 1
+                return array
+            self.misses += 1
+        return np.empty(shape, dtype=dtype)
+
+    def give(self, array: np.ndarray) -> None:
+        if array.base is not None or not array.flags.c_contiguous:
+            return  # views would pin (or alias) memory the pool does not own
+        key = (array.shape, array.dtype.str)
+        with self._lock:
+            if array.nbytes > self.max_bytes:
+                return
+            self._free.setdefault(key, []).append(array)
+            self._free.move_to_end(key)
+            self._pooled_bytes += array.nbytes
+            self._evict()
+
+    @contextmanager
+    def borrow(self, shape: tuple[int, ...], dtype: np.dtype | type) -> Iterator[np.ndarray]:
+        """Lend an uninitialized array for the ``with`` block; it must not escape it."""
+
+        array = self.take(shape, dtype)
+        try:
+            yield array
+        finally:
+            self.give(array)
+
+    def _evict(self) -> None:
+        while self._pooled_bytes > self.max_bytes and self._free:
+            _, arrays = self._free.popitem(last=False)
+            self._pooled_bytes -= sum(array.nbytes for array in arrays)
+            self.evictions += len(arrays)
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "pooled_bytes": self._pooled_bytes,
+                "pooled_arrays": sum(len(arrays) for arrays in self._free.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+buffer_pool = BufferPool(DEFAULT_POOL_BYTES)
@@ -0,0 +1,95 @@
+"""sRGB <-> CIELAB conversion for perceptual color distances."""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+import numpy as np
+
+# D65 reference white and the sRGB -> XYZ matrix (IEC 61966-2-1).
+_WHITE = np.array([0.95047, 1.0, 1.08883])
+_RGB_TO_XYZ = np.array(
+    [
+        [0.4124564, 0.3575761, 0.1804375],
+        [0.2126729, 0.7151522, 0.0721750],
+        [0.0193339, 0.1191920, 0.9503041],
+    ]
+)
+_XYZ_TO_RGB = np.linalg.inv(_RGB_TO_XYZ)
+_EPSILON = 216 / 24389
+_KAPPA = 24389 / 27
+
+# Bits kept per channel by the Lab lookup table: 64 ** 3 entries, 3 MB as float32.
+_LUT_BITS = 6
+
+
+def _linearize(values: np.ndarray) -> np.ndarray:
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+# Linear-light value of each 8-bit channel level, so whole images skip the power law.
+_LINEAR_LEVELS = _linearize(np.arange(256) / 255.0)
+
+
+def rgb_to_lab(rgb: np.ndarray, dtype: type = np.float64) -> np.ndarray:
+    """Convert ``(..., 3)`` 8-bit sRGB values to CIELAB (D65) of ``dtype``.
+
+    ``np.float32`` roughly halves the cost on whole images at well under 0.01
+    Delta-E of error.
+    """
+
+    rgb = np.asarray(rgb)
+    if rgb.dtype == np.uint8:
+        linear = _LINEAR_LEVELS.astype(dtype)[rgb]
+    else:
+        linear = _linearize(rgb.astype(dtype) / 255)
+    xyz = linear @ (_RGB_TO_XYZ.T / _WHITE).astype(dtype)
+    f = np.cbrt(xyz)
+    small = xyz <= _EPSILON
+    f[small] = (_KAPPA * xyz[small] + 16) / 116
+    lightness = 116 * f[..., 1] - 16
+    a = 500 * (f[..., 0] - f[..., 1])
+    b = 200 * (f[..., 1] - f[..., 2])
+    return np.stack([lightness, a, b], axis=-1)
+
+
+@lru_cache(maxsize=1)
+def _lab_table() -> np.ndarray:
+    """Lab (float32) of every RGB bin center, indexed by the packed ``r, g, b`` bin."""
+
+    width = 1 << (8 - _LUT_BITS)
+    centers = np.arange(1 << _LUT_BITS) * width + (width - 1) / 2
+    grid = np.stack(np.meshgrid(centers, centers, centers, indexing="ij"), axis=-1)
+    return rgb_to_lab(grid).astype(np.float32).reshape(-1, 3)
+
+
+def rgb_to_lab_lut(rgb: np.ndarray) -> np.ndarray:
+    """Approximate float32 CIELAB of ``(..., 3)`` uint8 sRGB via a lookup table.
+
+    Each channel keeps its top ``_LUT_BITS`` bits; the three are packed into one
+    table index and the Lab value of the bin center is read in a single gather from
+    a table built on first use. Over all 8-bit colors the error averages about
+    0.9 Delta-E (at most about 3, in very dark colors), well inside the spread of
+    a k-means cluster.
+    """
+
+    shift = 8 - _LUT_BITS
+    rgb = np.asarray(rgb, dtype=np.uint8)
+    index = (rgb[..., 0] >> shift).astype(np.intp) << (2 * _LUT_BITS)
+    index |= (rgb[..., 1] >> shift).astype(np.intp) << _LUT_BITS
+    index |= rgb[..., 2] >> shift
+    return np.take(_lab_table(), index, axis=0)
+
+
+def lab_to_rgb(lab: np.ndarray) -> np.ndarray:
+    """Convert ``(..., 3)`` CIELAB (D65) values to 8-bit sRGB, clipping out-of-gamut colors."""
+
+    lab = np.asarray(lab, dtype=np.float64)
+    fy = (lab[..., 0] + 16) / 116
+    f = np.stack([fy + lab[..., 1] / 500, fy, fy - lab[..., 2] / 200], axis=-1)
+    xyz = np.where(f**3 > _EPSILON, f**3, (116 * f - 16) / _KAPPA) * _WHITE
+    linear = np.clip(xyz @ _XYZ_TO_RGB.T, 0, 1)
+    encoded = np.where(
+        linear <= 0.0031308, linear * 12.92, 1.055 * linear ** (1 / 2.4) - 0.055
+    )
+    return np.clip(np.rint(encoded * 255), 0, 255).astype(np.uint8)
@@ -2,13 +2,173 @@
 
 from __future__ import annotations
 
+from dataclasses import dataclass
+
 import numpy as np
 from PIL import Image, ImageDraw
 
+from app.services.image_pipeline.buffers import buffer_pool
 from app.services.image_pipeline.fonts import load_font
-from app.services.image_pipeline.regions import find_regions, region_label_position
+from app.services.image_pipeline.outline import compute_borders, paint_borders
+from app.services.image_pipeline.regions import Region, find_regions, region_label_position
 
 NUMBER_GRAY = (160, 160, 160)
+RENDER_MODES = ("RGB", "L")
+
+
+def number_font_size(image_width: int) -> int:
+    """Font size used for region numbers on a page ``image_width`` pixels wide."""
+
+    base_font_size = image_width // 120
+    return max(12, int(base_font_size * 0.85))
+
+
+def draw_number(draw: ImageDraw.ImageDraw, x: int, y: int, text: str, font, mode: str) -> None:
+    """Draw ``text`` centred on ``(x, y)`` with a thin white halo."""
+
+    halo = 255 if mode == "L" else "white"
+    ink = NUMBER_GRAY[0] if mode == "L" else NUMBER_GRAY
+    offsets = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+    for dx, dy in offsets:
+        draw.text((x + dx, y + dy), text, fill=halo, font=font, anchor="mm")
+    draw.text((x, y), text, fill=ink, font=font, anchor="mm")
+
+
+@dataclass
+class NumberLayout:
+    """Regions of a label map and where their numbers go.
+
+    Finding regions and anchors is the slow, pure-Python part of numbering, so the
+    pipeline computes the layout once and shares it between the page renderer and
+    the editable region model.
+    """
+
+    regions: list[Region]
+    anchors: list[list[tuple[int, int]]]  # (y, x) per number; empty below min_region_size
+
+
+def number_half_extent(font, max_number: int) -> tuple[int, int]:
+    """Largest half extent (dy, dx) any number up to ``max_number`` reaches, halo included."""
+
+    half_h = half_w = 0
+    for number in range(1, max_number + 1):
+        left, top, right, bottom = font.getbbox(str(number), anchor="mm")
+        half_w = max(half_w, -left, right)
+        half_h = max(half_h, -top, bottom)
+    return half_h + 2, half_w + 2
+
+
+class _LabelIndex:
+    """Spatial hash of placed number boxes with buckets the size of one box."""
+
+    def __init__(self, box_h: int, box_w: int) -> None:
+        self.box_h = box_h
+        self.box_w = box_w
+        self._buckets: dict[tuple[int, int], list[tuple[int, int]]] = {}
+
+    def add(self, y: int, x: int) -> None:
+        self._buckets.setdefault((y // self.box_h, x // self.box_w), []).append((y, x))
+
+    def collides(self, y: int, x: int) -> bool:
+        by, bx = y // self.box_h, x // self.box_w
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                for py, px in self._buckets.get((by + dy, bx + dx), ()):
+                    if abs(py - y) < self.box_h and abs(px - x) < self.box_w:
+                        return True
+        return False
+
+
+def _grid_candidates(
+    coords: np.ndarray, spacing: int, min_fill: int
+) -> list[tuple[int, int]]:
+    """One point per ``spacing`` grid cell holding at least ``min_fill`` of ``coords``.
+
+    The point is the region pixel nearest the centroid of the cell's region pixels,
+    so it always lies inside the region even when the cell is cut by a border.
+    """
+
+    cells = coords // spacing
+    keys = cells[:, 0] * (int(cells[:, 1].max()) + 1) + cells[:, 1]
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    centroids = np.stack(
+        [np.bincount(inverse, weights=coords[:, axis]) / counts for axis in (0, 1)], axis=1
+    )
+    distance = ((coords - centroids[inverse]) ** 2).sum(axis=1)
+    order = np.lexsort((distance, inverse))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = inverse[order[1:]] != inverse[order[:-1]]
+    nearest = order[first]  # one pixel per cell, cells in ascending key order
+
+    full = counts >= min_fill
+    return [(int(y), int(x)) for y, x in coords[nearest[full]]]
+
+
+def layout_numbers(
+    label_img, min_region_size: int = 0, *, spacing: int = 0, line_width: int = 1
+) -> NumberLayout:
+    """Find every region of ``label_img`` and where to put its numbers.
+
+    Each numbered region gets its usual anchor from ``region_label_position``. With
+    ``spacing`` set, regions long enough to hold two numbers ``spacing`` apart also
+    get a candidate in each ``spacing`` grid cell where a number box fits. A
+    candidate is kept when its number box, grown by ``line_width``, lies entirely
+    inside the region (so it touches no border), it is at least ``spacing`` from the
+    region's other numbers, and it clears every number already placed. Placed boxes live in a spatial hash with buckets the
+    size of one box, so each collision check only visits the 3x3 surrounding buckets.
+    """
+
+    labels = np.asarray(label_img)
+    height, width = labels.shape
+    regions = find_regions(labels)
+    anchors: list[list[tuple[int, int]]] = []
+    for region in regions:
+        if min_region_size and region.size() < min_region_size:
+            anchors.append([])
+        else:
+            anchors.append([region_label_position(labels, region)])
+    if not spacing:
+        return NumberLayout(regions=regions, anchors=anchors)
+
+    font = load_font(number_font_size(width))
+    half_h, half_w = number_half_extent(font, int(labels.max()) + 1)
+    index = _LabelIndex(2 * half_h + 1, 2 * half_w + 1)
+    for points in anchors:
+        for y, x in points:
+            index.add(y, x)
+
+    box_area = (2 * half_h + 1) * (2 * half_w + 1)
+    min_extra_size = spacing * (2 * half_h + 1)
+    for region, points in zip(regions, anchors):
+        if not points or region.size() < min_extra_size:
+            continue
+        coords = np.asarray(region.pixels)
+        for y, x in _grid_candidates(coords, spacing, box_area):
+            if any((y - py) ** 2 + (x - px) ** 2 < spacing * spacing for py, px in points):
+                continue
+            y0, x0 = y - half_h - line_width, x - half_w - line_width
+            y1, x1 = y + half_h + line_width + 1, x + half_w + line_width + 1
+            if y0 < 0 or x0 < 0 or y1 > height or x1 > width:
+                continue
+            if index.collides(y, x):
+                continue
+            if not np.all(labels[y0:y1, x0:x1] == region.label):
+                continue
+            points.append((y, x))
+            index.add(y, x)
+
+    return NumberLayout(regions=regions, anchors=anchors)
+
+
+def _stamp_numbers(image: Image.Image, layout: NumberLayout) -> None:
+    """Draw each region's number in place on ``image``."""
+
+    draw = ImageDraw.Draw(image)
+    font = load_font(number_font_size(image.width))
+
+    for region, points in zip(layout.regions, layout.anchors):
+        for y, x in points:
+            draw_number(draw, x, y, str(region.label + 1), font, image.mode)
 
 
 def add_numbers(
@@ -21,28 +181,36 @@ def add_numbers(
         raise ValueError("label_img must be a 2D array")
 
     result = outline_img.convert("RGB")
-    draw = ImageDraw.Draw(result)
-    base_font_size = result.width // 120
-    font_size = max(12, int(base_font_size * 0.85))
-    font = load_font(font_size)
+    _stamp_numbers(result, layout_numbers(labels, min_region_size))
+    return result
 
-    def draw_label(x: int, y: int, text: str) -> None:
-        offsets = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        for dx, dy in offsets:
-            draw.text((x + dx, y + dy), text, fill="white", font=font, anchor="mm")
-        draw.text((x, y), text, fill=NUMBER_GRAY, font=font, anchor="mm")
 
-    regions = find_regions(labels)
-    region_counts: dict[int, int] = {}
+def render_numbered_outline(
+    label_img,
+    min_region_size: int = 0,
+    *,
+    line_width: int = 1,
+    mode: str = "RGB",
+    layout: NumberLayout | None = None,
+) -> Image.Image:
+    """Render outlines and region numbers in one pass onto a single ``mode`` canvas.
 
-    for region in regions:
-        if min_region_size and region.size() < min_region_size:
-            continue
-        region_counts.setdefault(region.label, 0)
-        region_counts[region.label] += 1
-        text = str(region.label + 1)
+    Equivalent to ``add_numbers(make_outline_image(label_img), ...)`` without the
+    intermediate grayscale outline image and its RGB conversion. Pass a ``layout``
+    from ``layout_numbers`` to reuse regions and anchors already computed.
+    """
+
+    if mode not in RENDER_MODES:
+        raise ValueError(f"mode must be one of {', '.join(RENDER_MODES)}")
+
+    labels = np.asarray(label_img)
+    height, width = labels.shape
 
-        y, x = region_label_position(labels, region)
-        draw_label(x, y, text)
+    result = Image.new(mode, (width, height), "white")
+    with buffer_pool.borrow(labels.shape, bool) as borders:
+        paint_borders(result, compute_borders(labels, line_width, out=borders))
 
+    if layout is None:
+        layout = layout_numbers(labels, min_region_size)
+    _stamp_numbers(result, layout)
     return result
@@ -5,27 +5,76 @@ from __future__ import annotations
 import numpy as np
 from PIL import Image
 
+from app.services.image_pipeline.buffers import buffer_pool
+
 OUTLINE_GRAY = 160  # softer line color instead of harsh black
 
 
-def make_outline_image(label_img) -> Image.Image:
-    """Return a monochrome outline image from a 2D label array."""
+def compute_borders(
+    label_img, line_width: int = 1, out: np.ndarray | None = None
+) -> np.ndarray:
+    """Return a boolean mask of region boundaries from a 2D label array.
+
+    ``line_width=1`` marks both pixels of every differing neighbor pair; each extra
+    step dilates the mask by one pixel on every side. Only the mask is allocated; the
+    scratch buffer of the same size comes from the buffer pool. Pass a boolean
+    ``out`` of the label map's shape to fill it instead of allocating the mask.
+    """
 
     labels = np.asarray(label_img)
     if labels.ndim != 2:
         raise ValueError("label_img must be a 2D array")
+    if line_width < 1:
+        raise ValueError("line_width must be a positive integer")
 
-    borders = np.zeros_like(labels, dtype=bool)
+    height, width = labels.shape
+    if out is None:
+        borders = np.zeros((height, width), dtype=bool)
+    else:
+        borders = out
+        borders.fill(False)
+    with buffer_pool.borrow((height * width,), bool) as scratch:
+        _mark_borders(labels, borders, scratch, line_width)
+    return borders
 
-    diff_down = labels[:-1, :] != labels[1:, :]
+
+def _mark_borders(
+    labels: np.ndarray, borders: np.ndarray, scratch: np.ndarray, line_width: int
+) -> None:
+    height, width = labels.shape
+    diff_down = scratch[: (height - 1) * width].reshape(height - 1, width)
+    np.not_equal(labels[:-1, :], labels[1:, :], out=diff_down)
     borders[:-1, :] |= diff_down
     borders[1:, :] |= diff_down
 
-    diff_right = labels[:, :-1] != labels[:, 1:]
+    diff_right = scratch[: height * (width - 1)].reshape(height, width - 1)
+    np.not_equal(labels[:, :-1], labels[:, 1:], out=diff_right)
     borders[:, :-1] |= diff_right
     borders[:, 1:] |= diff_right
 
-    outline = np.full(labels.shape, 255, dtype=np.uint8)
+    previous = scratch.reshape(height, width)
+    for _ in range(line_width - 1):
+        np.copyto(previous, borders)
+        borders[1:, :] |= previous[:-1, :]
+        borders[:-1, :] |= previous[1:, :]
+        np.copyto(previous, borders)
+        borders[:, 1:] |= previous[:, :-1]
+        borders[:, :-1] |= previous[:, 1:]
+
+
+def paint_borders(image: Image.Image, borders: np.ndarray) -> None:
+    """Paint the ``borders`` mask onto an ``L`` or ``RGB`` image in place."""
+
+    line_color = OUTLINE_GRAY if image.mode == "L" else (OUTLINE_GRAY,) * 3
+    image.paste(line_color, mask=Image.fromarray(borders))
+
+
+def make_outline_image(label_img, line_width: int = 1) -> Image.Image:
+    """Return a monochrome outline image from a 2D label array."""
+
+    borders = compute_borders(label_img, line_width)
+
+    outline = np.full(borders.shape, 255, dtype=np.uint8)
     outline[borders] = OUTLINE_GRAY
 
     return Image.fromarray(outline, mode="L")
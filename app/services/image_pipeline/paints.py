@@ -0,0 +1,73 @@
+"""Physical paint inventories and nearest-paint lookup in CIELAB."""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+from sklearn.neighbors import KDTree
+
+from app.services.image_pipeline.colorspace import rgb_to_lab
+
+DEFAULT_INVENTORY_PATH = Path(__file__).resolve().parents[2] / "data" / "paint_inventory.json"
+
+
+@dataclass(frozen=True)
+class Paint:
+    code: str
+    name: str
+    rgb: tuple[int, int, int]
+
+
+class PaintInventory:
+    """A fixed set of paints, searchable by perceptual (CIELAB) distance."""
+
+    def __init__(self, paints: Iterable[Paint]):
+        self.paints = tuple(paints)
+        if not self.paints:
+            raise ValueError("paint inventory is empty")
+        self.rgb = np.array([paint.rgb for paint in self.paints], dtype=np.uint8)
+        self._by_code = {paint.code: index for index, paint in enumerate(self.paints)}
+        if len(self._by_code) != len(self.paints):
+            raise ValueError("paint codes must be unique")
+
+    def __len__(self) -> int:
+        return len(self.paints)
+
+    @cached_property
+    def _tree(self) -> KDTree:
+        return KDTree(rgb_to_lab(self.rgb))
+
+    def nearest(self, colors: np.ndarray) -> np.ndarray:
+        """Index of the closest paint for each ``(N, 3)`` RGB color."""
+
+        colors = np.asarray(colors).reshape(-1, 3)
+        return self._tree.query(rgb_to_lab(colors), k=1, return_distance=False)[:, 0]
+
+    def subset(self, codes: Iterable[str]) -> PaintInventory:
+        """The paints with ``codes``, in the given order; unknown codes raise ValueError."""
+
+        codes = list(dict.fromkeys(codes))
+        unknown = [code for code in codes if code not in self._by_code]
+        if unknown:
+            raise ValueError(f"unknown paint codes: {', '.join(unknown)}")
+        return PaintInventory(self.paints[self._by_code[code]] for code in codes)
+
+
+@lru_cache(maxsize=4)
+def load_paint_inventory(path: str | None = None) -> PaintInventory:
+    """Load a JSON list of ``{"code", "name", "hex"}`` paints; cached per path."""
+
+    entries = json.loads(Path(path or DEFAULT_INVENTORY_PATH).read_text())
+    return PaintInventory(
+        Paint(
+            code=str(entry["code"]),
+            name=str(entry["name"]),
+            rgb=tuple(int(entry["hex"].lstrip("#")[i : i + 2], 16) for i in (0, 2, 4)),
+        )
+        for entry in entries
+    )
@@ -9,6 +9,7 @@ import numpy as np
 from PIL import Image, ImageDraw
 
 from app.services.image_pipeline.fonts import load_font
+from app.services.image_pipeline.paints import Paint
 
 
 def rgb_to_hex(color: Sequence[int]) -> str:
@@ -16,24 +17,30 @@ def rgb_to_hex(color: Sequence[int]) -> str:
     return f"#{r:02X}{g:02X}{b:02X}"
 
 
-def build_palette_metadata(palette: np.ndarray) -> list[dict[str, object]]:
+def build_palette_metadata(
+    palette: np.ndarray, paints: Sequence[Paint] | None = None
+) -> list[dict[str, object]]:
+    """Number each palette color; ``paints`` (one per color) adds paint names and codes."""
+
     metadata: list[dict[str, object]] = []
     for idx, color in enumerate(palette, start=1):
         rgb = tuple(int(c) for c in color.tolist())
-        metadata.append(
-            {
-                "number": idx,
-                "rgb": rgb,
-                "hex": rgb_to_hex(rgb),
-            }
-        )
+        entry: dict[str, object] = {
+            "number": idx,
+            "rgb": rgb,
+            "hex": rgb_to_hex(rgb),
+        }
+        if paints is not None:
+            entry["name"] = paints[idx - 1].name
+            entry["code"] = paints[idx - 1].code
+        metadata.append(entry)
     return metadata
 
 
 def render_palette_pdf(
     metadata: list[dict[str, object]], width: int = 2550, height: int = 3300
 ) -> bytes:
-    """Create a simple legend PDF listing colors, numbers, and hex codes."""
+    """Create a simple legend PDF listing colors, numbers, and hex codes (or paint names)."""
 
     image = Image.new("RGB", (width, height), "white")
     draw = ImageDraw.Draw(image)
@@ -64,7 +71,10 @@ def render_palette_pdf(
         )
         draw.rectangle(swatch_box, fill=tuple(entry["rgb"]), outline="black")
 
-        text = f"#{entry['number']}  RGB {entry['rgb']}  HEX {entry['hex']}"
+        if "code" in entry:
+            text = f"#{entry['number']}  {entry['name']} ({entry['code']})  HEX {entry['hex']}"
+        else:
+            text = f"#{entry['number']}  RGB {entry['rgb']}  HEX {entry['hex']}"
         draw.text(
             (left_margin + swatch_size + 40, y + swatch_size / 2),
             text,
@@ -80,13 +90,5 @@ def render_palette_pdf(
 
 def render_painted_preview(label_img, palette: np.ndarray) -> Image.Image:
     labels = np.asarray(label_img)
-    height, width = labels.shape
-    preview = Image.new("RGB", (width, height), "white")
-    pixels = preview.load()
-
-    for y in range(height):
-        for x in range(width):
-            color = tuple(int(c) for c in palette[labels[y, x]])
-            pixels[x, y] = color
-
-    return preview
+    colors = np.asarray(palette, dtype=np.uint8)[labels]
+    return Image.fromarray(colors, mode="RGB")
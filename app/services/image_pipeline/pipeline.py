@@ -2,17 +2,262 @@
 
 from __future__ import annotations
 
-from typing import BinaryIO
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import BinaryIO, Callable, Iterable, Sequence
 
 import numpy as np
 from PIL import Image
 
 from app.services.image_pipeline.io import load_and_resize
-from app.services.image_pipeline.numbering import add_numbers
-from app.services.image_pipeline.outline import make_outline_image
-from app.services.image_pipeline.palette import render_painted_preview
-from app.services.image_pipeline.quantize import quantize_colors
-from app.services.image_pipeline.regions import merge_small_regions
+from app.services.image_pipeline.numbering import (
+    NumberLayout,
+    layout_numbers,
+    render_numbered_outline,
+)
+from app.services.image_pipeline.palette import (
+    build_palette_metadata,
+    render_painted_preview,
+    render_palette_pdf,
+)
+from app.services.image_pipeline.prefilter import prefilter_image
+from app.services.image_pipeline.paints import Paint, PaintInventory
+from app.services.image_pipeline.quantize import (
+    COLOR_SPACES,
+    assign_paints,
+    quantize_colors,
+    quantize_superpixels,
+    snap_to_paints,
+)
+from app.services.image_pipeline.regions import (
+    RegionStats,
+    choose_min_region_size,
+    count_regions,
+    label_components,
+    merge_components,
+    merge_small_regions_counted,
+)
+
+OUTPUTS: tuple[str, ...] = ("image", "preview", "legend")
+STAGE_WORKERS = len(OUTPUTS)  # the render stages are the widest point of the graph
+PALETTE_MODES: tuple[str, ...] = ("kmeans", "snap", "inventory")
+SEGMENTATIONS: tuple[str, ...] = ("pixels", "superpixels")
+
+
+@dataclass(frozen=True)
+class Stage:
+    """A pipeline step computing ``name`` from the results of ``deps`` (passed in order)."""
+
+    name: str
+    func: Callable[..., object]
+    deps: tuple[str, ...] = ()
+
+
+@dataclass
+class PipelineResult:
+    label_img: np.ndarray
+    palette: np.ndarray
+    palette_metadata: list[dict[str, object]]
+    image: Image.Image | None = None
+    preview: Image.Image | None = None
+    legend: bytes | None = None
+    region_stats: RegionStats | None = None
+    min_region_size: int = 0
+    layout: NumberLayout | None = None  # set when the image was rendered
+
+
+@lru_cache(maxsize=1)
+def default_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix="pipeline")
+
+
+def run_stages(
+    stages: Sequence[Stage], targets: Iterable[str], executor: Executor | None = None
+) -> dict[str, object]:
+    """Run only the stages ``targets`` depend on, each as soon as its inputs exist.
+
+    Independent ready stages are submitted to ``executor`` together; without an
+    executor they run inline in dependency order.
+    """
+
+    by_name = {stage.name: stage for stage in stages}
+    needed: set[str] = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name in needed:
+            continue
+        if name not in by_name:
+            raise ValueError(f"unknown pipeline stage: {name}")
+        needed.add(name)
+        stack.extend(by_name[name].deps)
+
+    results: dict[str, object] = {}
+    running: dict[Future, str] = {}
+    waiting = [stage for stage in stages if stage.name in needed]
+
+    while waiting or running:
+        ready = [stage for stage in waiting if all(dep in results for dep in stage.deps)]
+        if not ready and not running:
+            raise ValueError("pipeline stages form a dependency cycle")
+        for stage in ready:
+            waiting.remove(stage)
+            args = [results[dep] for dep in stage.deps]
+            if executor is None:
+                results[stage.name] = stage.func(*args)
+            else:
+                running[executor.submit(stage.func, *args)] = stage.name
+        if not running:
+            continue
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[running.pop(future)] = future.result()
+
+    return results
+
+
+def run_pipeline(
+    image_file: BinaryIO,
+    *,
+    num_colors: int,
+    max_width: int,
+    min_region_size: int = 0,
+    max_regions: int | None = None,
+    prefilter_strength: int = 0,
+    line_width: int = 1,
+    number_spacing_ratio: float = 0.0,
+    page_mode: str = "L",
+    palette_mode: str = "kmeans",
+    inventory: PaintInventory | None = None,
+    segmentation: str = "pixels",
+    superpixel_size: int = 12,
+    color_space: str = "rgb",
+    outputs: Iterable[str] = OUTPUTS,
+    executor: Executor | None = None,
+    concurrent: bool = True,
+) -> PipelineResult:
+    """Run the stages needed for ``outputs``; the render stages run concurrently.
+
+    Once the label map exists the numbered page, painted preview and legend PDF only
+    share read-only inputs, so they are submitted to a thread pool together (their
+    NumPy/Pillow work releases the GIL). Outputs not requested are never computed.
+
+    With ``max_regions`` set, ``min_region_size`` is ignored and replaced by the
+    smallest threshold that keeps at most that many components; the number of
+    regions actually left is reported in ``region_stats.regions``.
+
+    ``number_spacing_ratio`` repeats numbers in large regions roughly every that
+    fraction of the page width (see ``layout_numbers``); ``0`` draws one per region.
+
+    ``palette_mode`` picks the colors: ``"kmeans"`` fits ``num_colors`` centers,
+    ``"snap"`` fits them and replaces each with its nearest paint in ``inventory``,
+    and ``"inventory"`` skips fitting and assigns pixels straight to the nearest
+    paint of ``inventory`` (``num_colors`` is ignored). The paint modes add paint
+    names and codes to the palette metadata.
+
+    ``segmentation="superpixels"`` first groups pixels into SLIC superpixels about
+    ``superpixel_size`` pixels across and colors whole superpixels, clustering (or
+    matching to paints) one mean color per superpixel instead of every pixel.
+
+    ``color_space="lab"`` fits the k-means palette in CIELAB instead of sRGB; it
+    does not affect ``"inventory"``, which always matches paints in CIELAB.
+
+    ``concurrent=False`` runs every stage on the calling thread, so a profiler
+    attached to that thread sees the whole run.
+    """
+
+    outputs = tuple(outputs)
+    unknown = set(outputs) - set(OUTPUTS)
+    if unknown:
+        raise ValueError(f"unknown outputs: {', '.join(sorted(unknown))}")
+    if palette_mode not in PALETTE_MODES:
+        raise ValueError(f"palette_mode must be one of {', '.join(PALETTE_MODES)}")
+    if palette_mode != "kmeans" and inventory is None:
+        raise ValueError(f"palette_mode {palette_mode!r} requires a paint inventory")
+    if segmentation not in SEGMENTATIONS:
+        raise ValueError(f"segmentation must be one of {', '.join(SEGMENTATIONS)}")
+    if color_space not in COLOR_SPACES:
+        raise ValueError(f"color_space must be one of {', '.join(COLOR_SPACES)}")
+    superpixels = segmentation == "superpixels"
+
+    def quantize(img: Image.Image) -> tuple[np.ndarray, np.ndarray, list[Paint] | None]:
+        if palette_mode == "inventory":
+            return assign_paints(img, inventory, superpixel_size if superpixels else None)
+        if superpixels:
+            labels, palette = quantize_superpixels(
+                img, num_colors, superpixel_size, color_space=color_space
+            )
+        else:
+            labels, palette = quantize_colors(img, num_colors=num_colors, color_space=color_space)
+        if palette_mode == "snap":
+            return snap_to_paints(labels, palette, inventory)
+        return labels, palette, None
+
+    def merge(
+        quantized: tuple[np.ndarray, np.ndarray, list[Paint] | None],
+    ) -> tuple[np.ndarray, RegionStats | None, int]:
+        label_img = quantized[0]
+        if max_regions is not None:
+            components, sizes = label_components(label_img)
+            threshold = choose_min_region_size(sizes, max_regions)
+            merged, stats = merge_components(label_img, components, sizes, threshold)
+            stats.regions = count_regions(merged, components)
+            return merged, stats, threshold
+        if min_region_size > 0:
+            return (*merge_small_regions_counted(label_img, min_region_size), min_region_size)
+        return label_img, None, min_region_size
+
+    stages = [
+        Stage("resized", lambda: load_and_resize(image_file, max_width=max_width)),
+        Stage("filtered", lambda img: prefilter_image(img, prefilter_strength), ("resized",)),
+        Stage("quantized", quantize, ("filtered",)),
+        Stage("palette", lambda quantized: quantized[1], ("quantized",)),
+        Stage("paints", lambda quantized: quantized[2], ("quantized",)),
+        Stage("merged", merge, ("quantized",)),
+        Stage("label_img", lambda merged: merged[0], ("merged",)),
+        Stage("region_stats", lambda merged: merged[1], ("merged",)),
+        Stage("min_region_size", lambda merged: merged[2], ("merged",)),
+        Stage("palette_metadata", build_palette_metadata, ("palette", "paints")),
+        Stage(
+            "layout",
+            lambda labels, threshold: layout_numbers(
+                labels,
+                threshold,
+                spacing=int(round(labels.shape[1] * number_spacing_ratio)),
+                line_width=line_width,
+            ),
+            ("label_img", "min_region_size"),
+        ),
+        Stage(
+            "image",
+            lambda labels, threshold, layout: render_numbered_outline(
+                labels, threshold, line_width=line_width, mode=page_mode, layout=layout
+            ),
+            ("label_img", "min_region_size", "layout"),
+        ),
+        Stage("preview", render_painted_preview, ("label_img", "palette")),
+        Stage("legend", render_palette_pdf, ("palette_metadata",)),
+    ]
+
+    if not concurrent:
+        executor = None
+    elif executor is None and len(outputs) > 1:
+        executor = default_executor()
+    targets = ("label_img", "palette_metadata", "region_stats", "min_region_size", *outputs)
+    results = run_stages(stages, targets, executor)
+
+    return PipelineResult(
+        label_img=results["label_img"],
+        palette=results["palette"],
+        palette_metadata=results["palette_metadata"],
+        image=results.get("image"),
+        preview=results.get("preview"),
+        legend=results.get("legend"),
+        region_stats=results["region_stats"],
+        min_region_size=results["min_region_size"],
+        layout=results.get("layout"),
+    )
 
 
 def render_paint_by_numbers(
@@ -21,14 +266,18 @@ def render_paint_by_numbers(
     num_colors: int,
     max_width: int,
     min_region_size: int = 0,
+    line_width: int = 1,
+    page_mode: str = "L",
 ) -> tuple[Image.Image, Image.Image, np.ndarray, np.ndarray]:
     """Run the complete pipeline and return the final image plus metadata."""
 
-    resized = load_and_resize(image_file, max_width=max_width)
-    label_img, palette = quantize_colors(resized, num_colors=num_colors)
-    if min_region_size > 0:
-        label_img = merge_small_regions(label_img, min_region_size)
-    outline_img = make_outline_image(label_img)
-    numbered_img = add_numbers(outline_img, label_img, palette, min_region_size)
-    preview_img = render_painted_preview(label_img, palette)
-    return numbered_img, preview_img, palette, label_img
+    result = run_pipeline(
+        image_file,
+        num_colors=num_colors,
+        max_width=max_width,
+        min_region_size=min_region_size,
+        line_width=line_width,
+        page_mode=page_mode,
+        outputs=("image", "preview"),
+    )
+    return result.image, result.preview, result.palette, result.label_img
@@ -6,18 +6,47 @@ import numpy as np
 from PIL import Image
 from sklearn.cluster import KMeans
 
+from app.services.image_pipeline.colorspace import lab_to_rgb, rgb_to_lab, rgb_to_lab_lut
+from app.services.image_pipeline.paints import Paint, PaintInventory
+from app.services.image_pipeline.superpixels import slic_superpixels
 
-def quantize_colors(image: Image.Image, num_colors: int) -> tuple[np.ndarray, np.ndarray]:
-    """Reduce the palette of ``image`` to ``num_colors`` clusters via k-means."""
+COLOR_SPACES: tuple[str, ...] = ("rgb", "lab")
 
+
+def _check_arguments(num_colors: int, color_space: str) -> None:
     if num_colors <= 0:
         raise ValueError("num_colors must be a positive integer")
+    if color_space not in COLOR_SPACES:
+        raise ValueError(f"color_space must be one of {', '.join(COLOR_SPACES)}")
+
+
+def _palette(centers: np.ndarray, color_space: str) -> np.ndarray:
+    """8-bit sRGB palette from k-means centers fitted in ``color_space``."""
+
+    if color_space == "lab":
+        return lab_to_rgb(centers)
+    return np.clip(np.rint(centers), 0, 255).astype(np.uint8)
+
+
+def quantize_colors(
+    image: Image.Image, num_colors: int, color_space: str = "rgb"
+) -> tuple[np.ndarray, np.ndarray]:
+    """Reduce the palette of ``image`` to ``num_colors`` clusters via k-means.
+
+    ``color_space="lab"`` clusters CIELAB values (read from the lookup table in
+    ``rgb_to_lab_lut``) so cluster boundaries follow perceived differences; the
+    palette is still returned as sRGB.
+    """
+
+    _check_arguments(num_colors, color_space)
 
     rgb_image = image.convert("RGB")
     np_image = np.asarray(rgb_image, dtype=np.uint8)
     height, width, _ = np_image.shape
 
     flat_pixels = np_image.reshape(-1, 3)
+    if color_space == "lab":
+        flat_pixels = rgb_to_lab_lut(flat_pixels)
 
     kmeans = KMeans(
         n_clusters=num_colors,
@@ -27,6 +56,86 @@ def quantize_colors(image: Image.Image, num_colors: int) -> tuple[np.ndarray, np
     kmeans.fit(flat_pixels)
 
     labels = kmeans.labels_.reshape(height, width)
-    palette = np.clip(np.rint(kmeans.cluster_centers_), 0, 255).astype(np.uint8)
+    palette = _palette(kmeans.cluster_centers_, color_space)
+
+    return labels, palette
+
+
+def quantize_superpixels(
+    image: Image.Image, num_colors: int, step: int, color_space: str = "rgb"
+) -> tuple[np.ndarray, np.ndarray]:
+    """Cluster SLIC superpixel mean colors, weighted by size, into ``num_colors``.
+
+    k-means runs over one item per superpixel instead of one per pixel, and every
+    superpixel gets a single color, so regions come out without per-pixel speckle.
+    ``color_space`` is as for ``quantize_colors``.
+    """
+
+    _check_arguments(num_colors, color_space)
+
+    segments, means, counts = slic_superpixels(image, step)
+    if color_space == "lab":
+        means = rgb_to_lab(means)
+    kmeans = KMeans(
+        n_clusters=min(num_colors, len(means)),
+        random_state=0,
+        n_init="auto",
+    )
+    kmeans.fit(means, sample_weight=counts)
+
+    labels = kmeans.labels_[segments]
+    palette = _palette(kmeans.cluster_centers_, color_space)
 
     return labels, palette
+
+
+def _compact(
+    paint_labels: np.ndarray, inventory: PaintInventory
+) -> tuple[np.ndarray, np.ndarray, list[Paint]]:
+    """Renumber paint indices to the paints actually used, in inventory order."""
+
+    used, labels = np.unique(paint_labels, return_inverse=True)
+    return (
+        labels.reshape(paint_labels.shape),
+        inventory.rgb[used],
+        [inventory.paints[index] for index in used],
+    )
+
+
+def snap_to_paints(
+    labels: np.ndarray, palette: np.ndarray, inventory: PaintInventory
+) -> tuple[np.ndarray, np.ndarray, list[Paint]]:
+    """Replace each fitted palette color with its nearest paint.
+
+    Clusters that snap to the same paint are merged, so the result can have fewer
+    colors than ``palette``.
+    """
+
+    return _compact(inventory.nearest(palette)[labels], inventory)
+
+
+def assign_paints(
+    image: Image.Image, inventory: PaintInventory, superpixel_step: int | None = None
+) -> tuple[np.ndarray, np.ndarray, list[Paint]]:
+    """Label every pixel with its nearest paint, without fitting a palette.
+
+    Each distinct color is looked up once, so the cost scales with the number of
+    distinct colors rather than pixels. With ``superpixel_step`` whole SLIC
+    superpixels are assigned by their mean color instead. Paints no pixel maps to
+    are dropped.
+    """
+
+    if superpixel_step is not None:
+        segments, means, _ = slic_superpixels(image, superpixel_step)
+        return snap_to_paints(segments, np.clip(np.rint(means), 0, 255), inventory)
+
+    np_image = np.asarray(image.convert("RGB"), dtype=np.uint8)
+    packed = (
+        np_image[..., 0].astype(np.uint32) << 16
+        | np_image[..., 1].astype(np.uint32) << 8
+        | np_image[..., 2]
+    )
+    colors, inverse = np.unique(packed, return_inverse=True)
+    unique_rgb = np.stack([colors >> 16, (colors >> 8) & 0xFF, colors & 0xFF], axis=1)
+    paint_labels = inventory.nearest(unique_rgb)[inverse].reshape(packed.shape)
+    return _compact(paint_labels, inventory)
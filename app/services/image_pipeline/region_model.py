@@ -0,0 +1,270 @@
+"""Editable region model for incremental re-rendering of a finished result."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from app.services.image_pipeline.fonts import load_font
+from app.services.image_pipeline.numbering import (
+    NumberLayout,
+    draw_number,
+    layout_numbers,
+    number_font_size,
+    number_half_extent,
+)
+from app.services.image_pipeline.outline import compute_borders, paint_borders
+from app.services.image_pipeline.regions import Region, region_label_position
+
+Box = tuple[int, int, int, int]  # y0, x0, y1, x1 (exclusive)
+
+
+@dataclass
+class RegionModel:
+    """Per-result region state: component map, adjacency, anchors and rendered pages.
+
+    Components are connected regions of one palette color, numbered in the order
+    ``layout_numbers`` lists them so that re-rendering reproduces the original
+    page exactly. Borders are drawn between *components*, so recoloring a region to
+    its neighbor's color keeps the line between them; merging removes it.
+    """
+
+    components: np.ndarray  # (H, W) int32 component id per pixel
+    colors: np.ndarray  # (N,) palette index per component
+    sizes: np.ndarray  # (N,) pixel count, 0 once merged away
+    boxes: np.ndarray  # (N, 4) y0, x0, y1, x1 bounding box per component
+    anchors: np.ndarray  # (M, 3) component, y, x of every drawn number
+    adjacency: list[set[int]]
+    palette: np.ndarray
+    min_region_size: int
+    line_width: int
+    page: Image.Image
+    preview: Image.Image
+
+    @property
+    def region_count(self) -> int:
+        return int(np.count_nonzero(self.sizes))
+
+    def component_at(self, x: int, y: int) -> int:
+        height, width = self.components.shape
+        if not (0 <= x < width and 0 <= y < height):
+            raise ValueError(f"point ({x}, {y}) is outside the {width}x{height} image")
+        return int(self.components[y, x])
+
+
+def _adjacency(components: np.ndarray, count: int) -> list[set[int]]:
+    pairs = []
+    for a, b in (
+        (components[:-1, :], components[1:, :]),
+        (components[:, :-1], components[:, 1:]),
+    ):
+        differs = a != b
+        pairs.append(np.stack([a[differs], b[differs]], axis=1))
+    edges = np.unique(np.concatenate(pairs), axis=0)
+
+    adjacency: list[set[int]] = [set() for _ in range(count)]
+    for a, b in edges.tolist():
+        adjacency[a].add(b)
+        adjacency[b].add(a)
+    return adjacency
+
+
+def build_region_model(
+    label_img,
+    palette: np.ndarray,
+    page: Image.Image,
+    preview: Image.Image,
+    *,
+    min_region_size: int = 0,
+    line_width: int = 1,
+    layout: NumberLayout | None = None,
+) -> RegionModel:
+    """Build the editable model for a label map already rendered to ``page``/``preview``.
+
+    Pass the ``layout`` the page was rendered with to skip finding regions again.
+    """
+
+    labels = np.asarray(label_img)
+    if labels.ndim != 2:
+        raise ValueError("label_img must be a 2D array")
+
+    if layout is None:
+        layout = layout_numbers(labels, min_region_size)
+    regions = layout.regions
+    count = len(regions)
+    components = np.empty(labels.shape, dtype=np.int32)
+    colors = np.empty(count, dtype=np.int32)
+    sizes = np.empty(count, dtype=np.int64)
+    boxes = np.empty((count, 4), dtype=np.int64)
+
+    anchors = []
+
+    for idx, (region, points) in enumerate(zip(regions, layout.anchors)):
+        coords = np.asarray(region.pixels)
+        components[coords[:, 0], coords[:, 1]] = idx
+        colors[idx] = region.label
+        sizes[idx] = len(coords)
+        boxes[idx] = (*coords.min(axis=0), *(coords.max(axis=0) + 1))
+        anchors.extend((idx, y, x) for y, x in points)
+
+    return RegionModel(
+        components=components,
+        colors=colors,
+        sizes=sizes,
+        boxes=boxes,
+        anchors=np.array(anchors, dtype=np.int64).reshape(-1, 3),
+        adjacency=_adjacency(components, count),
+        palette=np.asarray(palette),
+        min_region_size=min_region_size,
+        line_width=line_width,
+        page=page,
+        preview=preview,
+    )
+
+
+def _text_margin(model: RegionModel) -> tuple[int, int]:
+    font = load_font(number_font_size(model.page.width))
+    return number_half_extent(font, len(model.palette))
+
+
+def _union(a: Box | None, b: Box | None) -> Box | None:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def _clip(model: RegionModel, box: Box) -> Box:
+    height, width = model.components.shape
+    return (max(0, box[0]), max(0, box[1]), min(height, box[2]), min(width, box[3]))
+
+
+def _text_box(model: RegionModel, component: int) -> Box | None:
+    """Box covering every number drawn for ``component``, or ``None`` if it has none."""
+
+    points = model.anchors[model.anchors[:, 0] == component, 1:]
+    if not len(points):
+        return None
+    margin_y, margin_x = _text_margin(model)
+    y0, x0 = (int(v) for v in points.min(axis=0))
+    y1, x1 = (int(v) for v in points.max(axis=0))
+    return _clip(model, (y0 - margin_y, x0 - margin_x, y1 + margin_y + 1, x1 + margin_x + 1))
+
+
+def _component_box(model: RegionModel, component: int, pad: int = 0) -> Box:
+    y0, x0, y1, x1 = (int(v) for v in model.boxes[component])
+    return _clip(model, (y0 - pad, x0 - pad, y1 + pad, x1 + pad))
+
+
+def render_page_window(model: RegionModel, box: Box) -> Image.Image:
+    """Re-render outlines and numbers inside ``box`` and paste them onto ``model.page``."""
+
+    y0, x0, y1, x1 = box
+    height, width = model.components.shape
+
+    pad = model.line_width
+    cy0, cx0 = max(0, y0 - pad), max(0, x0 - pad)
+    cy1, cx1 = min(height, y1 + pad), min(width, x1 + pad)
+    borders = compute_borders(model.components[cy0:cy1, cx0:cx1], model.line_width)
+    borders = np.ascontiguousarray(borders[y0 - cy0 : y1 - cy0, x0 - cx0 : x1 - cx0])
+
+    patch = Image.new(model.page.mode, (x1 - x0, y1 - y0), "white")
+    paint_borders(patch, borders)
+
+    margin_y, margin_x = _text_margin(model)
+    ys, xs = model.anchors[:, 1], model.anchors[:, 2]
+    nearby = (
+        (ys >= y0 - margin_y)
+        & (ys < y1 + margin_y)
+        & (xs >= x0 - margin_x)
+        & (xs < x1 + margin_x)
+    )
+    draw = ImageDraw.Draw(patch)
+    font = load_font(number_font_size(model.page.width))
+    for component, y, x in model.anchors[nearby].tolist():
+        text = str(int(model.colors[component]) + 1)
+        draw_number(draw, x - x0, y - y0, text, font, patch.mode)
+
+    model.page.paste(patch, (x0, y0))
+    return patch
+
+
+def render_preview_window(model: RegionModel, box: Box) -> Image.Image:
+    """Re-render the painted preview inside ``box`` and paste it onto ``model.preview``."""
+
+    y0, x0, y1, x1 = box
+    window = model.components[y0:y1, x0:x1]
+    colors = model.palette[model.colors[window]].astype(np.uint8)
+    patch = Image.fromarray(colors, mode="RGB")
+    model.preview.paste(patch, (x0, y0))
+    return patch
+
+
+@dataclass
+class EditResult:
+    """Windows of ``page`` and ``preview`` touched by an edit."""
+
+    page_box: Box | None
+    preview_box: Box | None
+
+
+def merge_regions(model: RegionModel, source: int, target: int) -> EditResult:
+    """Merge component ``source`` into its neighbor ``target`` and re-render locally."""
+
+    if source == target:
+        raise ValueError("cannot merge a region into itself")
+    if not model.sizes[source] or not model.sizes[target]:
+        raise ValueError("region no longer exists")
+    if target not in model.adjacency[source]:
+        raise ValueError("regions are not adjacent")
+
+    source_box = _component_box(model, source)
+    page_box = _union(_component_box(model, source, pad=model.line_width), _text_box(model, source))
+
+    y0, x0, y1, x1 = source_box
+    window = model.components[y0:y1, x0:x1]
+    window[window == source] = target
+
+    model.sizes[target] += model.sizes[source]
+    model.sizes[source] = 0
+    model.boxes[target] = _union(_component_box(model, target), source_box)
+    model.anchors = model.anchors[model.anchors[:, 0] != source]
+    for neighbor in model.adjacency[source]:
+        model.adjacency[neighbor].discard(source)
+        if neighbor != target:
+            model.adjacency[neighbor].add(target)
+            model.adjacency[target].add(neighbor)
+    model.adjacency[source] = set()
+
+    eligible = not model.min_region_size or model.sizes[target] >= model.min_region_size
+    if not np.any(model.anchors[:, 0] == target) and eligible:
+        ty0, tx0, ty1, tx1 = _component_box(model, target)
+        coords = np.argwhere(model.components[ty0:ty1, tx0:tx1] == target) + (ty0, tx0)
+        region = Region(label=target, pixels=[(int(y), int(x)) for y, x in coords])
+        y, x = region_label_position(model.components, region)
+        model.anchors = np.vstack([model.anchors, [(target, y, x)]])
+        page_box = _union(page_box, _text_box(model, target))
+
+    render_page_window(model, page_box)
+    render_preview_window(model, source_box)
+    return EditResult(page_box=page_box, preview_box=source_box)
+
+
+def recolor_region(model: RegionModel, component: int, color: int) -> EditResult:
+    """Assign palette index ``color`` to ``component`` and re-render locally."""
+
+    if not 0 <= color < len(model.palette):
+        raise ValueError(f"color must be between 1 and {len(model.palette)}")
+    if not model.sizes[component]:
+        raise ValueError("region no longer exists")
+
+    model.colors[component] = color
+    preview_box = _component_box(model, component)
+    page_box = _text_box(model, component)
+    if page_box is not None:
+        render_page_window(model, page_box)
+    render_preview_window(model, preview_box)
+    return EditResult(page_box=page_box, preview_box=preview_box)
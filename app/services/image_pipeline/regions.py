@@ -7,6 +7,7 @@ from dataclasses import dataclass
 
 import numpy as np
 
+from app.services.image_pipeline.buffers import buffer_pool
 
 NEIGHBORS: tuple[tuple[int, int], ...] = ((1, 0), (-1, 0), (0, 1), (0, -1))
 
@@ -20,36 +21,44 @@ class Region:
         return len(self.pixels)
 
 
+@dataclass
+class RegionStats:
+    components: int  # connected components in the label map before merging
+    merged: int  # components smaller than the threshold folded into a neighbor
+    regions: int | None = None  # connected regions left after merging, when counted
+
+
 def find_regions(label_img) -> list[Region]:
     labels = np.asarray(label_img)
     height, width = labels.shape
-    visited = np.zeros_like(labels, dtype=bool)
     regions: list[Region] = []
 
-    for y in range(height):
-        for x in range(width):
-            if visited[y, x]:
-                continue
-            label = labels[y, x]
-            queue = deque([(y, x)])
-            visited[y, x] = True
-            pixels: list[tuple[int, int]] = []
+    with buffer_pool.borrow(labels.shape, bool) as visited:
+        visited.fill(False)
+        for y in range(height):
+            for x in range(width):
+                if visited[y, x]:
+                    continue
+                label = labels[y, x]
+                queue = deque([(y, x)])
+                visited[y, x] = True
+                pixels: list[tuple[int, int]] = []
 
-            while queue:
-                cy, cx = queue.popleft()
-                pixels.append((cy, cx))
-                for dy, dx in NEIGHBORS:
-                    ny, nx = cy + dy, cx + dx
-                    if (
-                        0 <= ny < height
-                        and 0 <= nx < width
-                        and not visited[ny, nx]
-                        and labels[ny, nx] == label
-                    ):
-                        visited[ny, nx] = True
-                        queue.append((ny, nx))
+                while queue:
+                    cy, cx = queue.popleft()
+                    pixels.append((cy, cx))
+                    for dy, dx in NEIGHBORS:
+                        ny, nx = cy + dy, cx + dx
+                        if (
+                            0 <= ny < height
+                            and 0 <= nx < width
+                            and not visited[ny, nx]
+                            and labels[ny, nx] == label
+                        ):
+                            visited[ny, nx] = True
+                            queue.append((ny, nx))
 
-            regions.append(Region(label=label, pixels=pixels))
+                regions.append(Region(label=label, pixels=pixels))
 
     return regions
 
@@ -60,79 +69,278 @@ def merge_small_regions(label_img, min_size: int) -> np.ndarray:
     if min_size <= 0:
         return np.asarray(label_img)
 
+    labels, _ = merge_small_regions_counted(label_img, min_size)
+    return labels
+
+
+def merge_small_regions_counted(label_img, min_size: int) -> tuple[np.ndarray, RegionStats]:
+    """Like ``merge_small_regions`` but also report how many components were seen and merged."""
+
     labels = np.asarray(label_img).copy()
     height, width = labels.shape
-    visited = np.zeros_like(labels, dtype=bool)
+    stats = RegionStats(components=0, merged=0)
+
+    with buffer_pool.borrow(labels.shape, bool) as visited:
+        visited.fill(False)
+        for y in range(height):
+            for x in range(width):
+                if visited[y, x]:
+                    continue
+                target_label = labels[y, x]
+                component = []
+                queue = deque([(y, x)])
+                visited[y, x] = True
+
+                while queue:
+                    cy, cx = queue.popleft()
+                    component.append((cy, cx))
+                    for dy, dx in NEIGHBORS:
+                        ny, nx = cy + dy, cx + dx
+                        if (
+                            0 <= ny < height
+                            and 0 <= nx < width
+                            and not visited[ny, nx]
+                            and labels[ny, nx] == target_label
+                        ):
+                            visited[ny, nx] = True
+                            queue.append((ny, nx))
+
+                stats.components += 1
+                if len(component) >= min_size:
+                    continue
+
+                neighbor_counts: Counter = Counter()
+                for cy, cx in component:
+                    for dy, dx in NEIGHBORS:
+                        ny, nx = cy + dy, cx + dx
+                        if 0 <= ny < height and 0 <= nx < width:
+                            neighbor_label = labels[ny, nx]
+                            if neighbor_label != target_label:
+                                neighbor_counts[neighbor_label] += 1
+
+                if not neighbor_counts:
+                    continue
+
+                replacement, _ = neighbor_counts.most_common(1)[0]
+                for cy, cx in component:
+                    labels[cy, cx] = replacement
+                stats.merged += 1
+
+    return labels, stats
+
+
+def label_components(label_img) -> tuple[np.ndarray, np.ndarray]:
+    """Return ``(component_map, sizes)`` for 4-connected regions, numbered in raster order."""
+
+    labels = np.asarray(label_img)
+    height, width = labels.shape
+    components = np.full(labels.shape, -1, dtype=np.int32)
+    sizes: list[int] = []
 
     for y in range(height):
         for x in range(width):
-            if visited[y, x]:
+            if components[y, x] >= 0:
                 continue
-            target_label = labels[y, x]
-            component = []
+            component = len(sizes)
+            label = labels[y, x]
             queue = deque([(y, x)])
-            visited[y, x] = True
+            components[y, x] = component
+            size = 0
 
             while queue:
                 cy, cx = queue.popleft()
-                component.append((cy, cx))
+                size += 1
                 for dy, dx in NEIGHBORS:
                     ny, nx = cy + dy, cx + dx
                     if (
                         0 <= ny < height
                         and 0 <= nx < width
-                        and not visited[ny, nx]
-                        and labels[ny, nx] == target_label
+                        and components[ny, nx] < 0
+                        and labels[ny, nx] == label
                     ):
-                        visited[ny, nx] = True
+                        components[ny, nx] = component
                         queue.append((ny, nx))
 
-            if len(component) >= min_size:
-                continue
+            sizes.append(size)
 
-            neighbor_counts: Counter = Counter()
-            for cy, cx in component:
-                for dy, dx in NEIGHBORS:
-                    ny, nx = cy + dy, cx + dx
-                    if 0 <= ny < height and 0 <= nx < width:
-                        neighbor_label = labels[ny, nx]
-                        if neighbor_label != target_label:
-                            neighbor_counts[neighbor_label] += 1
+    return components, np.asarray(sizes, dtype=np.int64)
 
-            if not neighbor_counts:
-                continue
 
-            replacement, _ = neighbor_counts.most_common(1)[0]
-            for cy, cx in component:
-                labels[cy, cx] = replacement
+def choose_min_region_size(sizes: np.ndarray, max_regions: int) -> int:
+    """Smallest threshold that leaves at most ``max_regions`` components at or above it."""
 
-    return labels
+    if max_regions <= 0:
+        raise ValueError("max_regions must be a positive integer")
+    if len(sizes) <= max_regions:
+        return 0
 
+    descending = np.sort(np.asarray(sizes))[::-1]
+    return int(descending[max_regions]) + 1
+
+
+def merge_components(
+    label_img, components: np.ndarray, sizes: np.ndarray, min_size: int
+) -> tuple[np.ndarray, RegionStats]:
+    """Merge components below ``min_size`` using a precomputed ``label_components`` result.
+
+    Small components are visited in component order and each joins the neighboring
+    group it shares the most border pixels with. Groups are tracked with a union-find
+    over component ids, so a small component merged into another small one follows it
+    when that one merges in turn. Small components can still close into a group of
+    their own (each member only borders the others); such groups then join the group
+    they share the most border with, measured over all their members, until every group
+    holds a component of ``min_size`` or more. That bounds the regions left by the
+    number of such components, which is what ``choose_min_region_size`` budgets for.
+    """
 
-def region_label_position(label_img, region: Region) -> tuple[int, int]:
     labels = np.asarray(label_img)
     height, width = labels.shape
-    best_score = -1
-    best_point = region.pixels[0]
-
-    def run_length(y: int, x: int, dy: int, dx: int) -> int:
-        count = 0
-        label = labels[y, x]
-        ny, nx = y + dy, x + dx
-        while 0 <= ny < height and 0 <= nx < width and labels[ny, nx] == label:
-            count += 1
-            ny += dy
-            nx += dx
-        return count
-
-    for y, x in region.pixels:
-        left = run_length(y, x, 0, -1)
-        right = run_length(y, x, 0, 1)
-        up = run_length(y, x, -1, 0)
-        down = run_length(y, x, 1, 0)
-        score = (left + 1) * (right + 1) * (up + 1) * (down + 1)
-        if score > best_score:
-            best_score = score
-            best_point = (y, x)
-
-    return best_point
+    sizes = np.asarray(sizes)
+    stats = RegionStats(components=len(sizes), merged=0)
+
+    small = np.flatnonzero(sizes < min_size)
+    if not len(small):
+        return labels.copy(), stats
+
+    component_labels = np.empty(len(sizes), dtype=labels.dtype)
+    component_labels[components.ravel()] = labels.ravel()
+
+    small_mask = np.zeros(len(sizes), dtype=bool)
+    small_mask[small] = True
+    ys, xs = np.nonzero(small_mask[components])
+    owners = components[ys, xs]
+    order = np.argsort(owners, kind="stable")
+    ys, xs, owners = ys[order], xs[order], owners[order]
+    bounds = np.searchsorted(owners, small).tolist() + [len(owners)]
+
+    neighbors = np.full((len(ys), len(NEIGHBORS)), -1, dtype=np.int64)
+    for column, (dy, dx) in enumerate(NEIGHBORS):
+        ny, nx = ys + dy, xs + dx
+        inside = (ny >= 0) & (ny < height) & (nx >= 0) & (nx < width)
+        neighbors[inside, column] = components[ny[inside], nx[inside]]
+
+    parent = np.arange(len(sizes))
+
+    def find(ids: np.ndarray) -> np.ndarray:
+        roots = parent[ids]
+        while True:
+            above = parent[roots]
+            if np.array_equal(above, roots):
+                return roots
+            roots = above
+
+    for component, start, end in zip(small.tolist(), bounds[:-1], bounds[1:]):
+        candidates = neighbors[start:end].ravel()
+        candidates = find(candidates[candidates >= 0])
+        root = int(find(np.array([component]))[0])
+        candidates = candidates[candidates != root]
+        if not len(candidates):
+            continue
+
+        roots, counts = np.unique(candidates, return_counts=True)
+        parent[root] = roots[np.argmax(counts)]
+        stats.merged += 1
+
+    small_owners = owners.astype(np.int64)
+    while True:
+        # Only small components are ever re-parented, so a small root means a group
+        # made of small components alone.
+        stranded = np.zeros(len(sizes), dtype=bool)
+        stranded[small[parent[small] == small]] = True
+        owner_roots = find(small_owners)
+        pending = stranded[owner_roots]
+        if not pending.any():
+            break
+
+        pairs = np.stack(
+            [np.repeat(owner_roots[pending], len(NEIGHBORS)), neighbors[pending].ravel()], axis=1
+        )
+        pairs = pairs[pairs[:, 1] >= 0]
+        pairs[:, 1] = find(pairs[:, 1])
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        if not len(pairs):
+            break  # a single group covers the whole image
+
+        edges, counts = np.unique(pairs, axis=0, return_counts=True)
+        best = np.lexsort((-counts, edges[:, 0]))
+        first = np.ones(len(best), dtype=bool)
+        first[1:] = edges[best[1:], 0] != edges[best[:-1], 0]
+        for root, target in edges[best[first]].tolist():
+            root, target = find(np.array([root, target])).tolist()
+            if root != target:
+                parent[root] = target
+                stats.merged += 1
+
+    merged = component_labels[find(np.arange(len(sizes)))][components]
+    return merged, stats
+
+
+def count_regions(label_img, components: np.ndarray) -> int:
+    """Count connected regions of ``label_img`` given a finer partition ``components``.
+
+    Every component must be uniformly labeled (true after ``merge_components``), so
+    regions are groups of touching components that share a label; they are found by
+    propagating the smallest component id across such pairs instead of another BFS.
+    """
+
+    labels = np.asarray(label_img)
+    count = int(components.max()) + 1
+    component_labels = np.empty(count, dtype=labels.dtype)
+    component_labels[components.ravel()] = labels.ravel()
+
+    pairs = []
+    for a, b in ((components[:-1, :], components[1:, :]), (components[:, :-1], components[:, 1:])):
+        touching = a != b
+        pairs.append(np.stack([a[touching], b[touching]], axis=1))
+    edges = np.unique(np.concatenate(pairs), axis=0)
+    edges = edges[component_labels[edges[:, 0]] == component_labels[edges[:, 1]]]
+
+    roots = np.arange(count)
+    while True:
+        lowest = np.minimum(roots[edges[:, 0]], roots[edges[:, 1]])
+        updated = roots.copy()
+        np.minimum.at(updated, edges[:, 0], lowest)
+        np.minimum.at(updated, edges[:, 1], lowest)
+        updated = updated[updated]
+        if np.array_equal(updated, roots):
+            break
+        roots = updated
+
+    return int(np.count_nonzero(roots == np.arange(count)))
+
+
+def region_label_position(label_img, region: Region) -> tuple[int, int]:
+    """The region pixel maximizing the product of its four same-label run lengths (+1).
+
+    Ties go to the first such pixel in ``region.pixels``. A run through a region
+    pixel never leaves the region, so the run lengths are computed for the region's
+    bounding box only.
+    """
+
+    labels = np.asarray(label_img)
+    coords = np.asarray(region.pixels)
+    (y0, x0), (y1, x1) = coords.min(axis=0), coords.max(axis=0)
+    scores = _run_length_scores(labels[y0 : y1 + 1, x0 : x1 + 1])
+    best = int(np.argmax(scores[coords[:, 0] - y0, coords[:, 1] - x0]))
+    return region.pixels[best]
+
+
+def _run_length_scores(labels: np.ndarray) -> np.ndarray:
+    """``(left + 1) * (right + 1) * (up + 1) * (down + 1)`` for every pixel, where each
+    term counts the same-label pixels continuing in that direction."""
+
+    scores = np.ones(labels.shape, dtype=np.int64)
+    for axis in (0, 1):
+        along = np.moveaxis(labels, axis, -1)
+        length = along.shape[-1]
+        index = np.broadcast_to(np.arange(length), along.shape)
+        starts = np.ones(along.shape, dtype=bool)
+        starts[..., 1:] = along[..., 1:] != along[..., :-1]
+        ends = np.ones(along.shape, dtype=bool)
+        ends[..., :-1] = starts[..., 1:]
+        run_start = np.maximum.accumulate(np.where(starts, index, 0), axis=-1)
+        run_end = np.minimum.accumulate(np.where(ends, index, length)[..., ::-1], axis=-1)[
+            ..., ::-1
+        ]
+        scores *= np.moveaxis((index - run_start + 1) * (run_end - index + 1), -1, axis)
+    return scores
@@ -0,0 +1,123 @@
+"""SLIC superpixels, vectorized over a grid of square cells."""
+
+from __future__ import annotations
+
+import numpy as np
+from PIL import Image
+
+from app.services.image_pipeline.buffers import buffer_pool
+from app.services.image_pipeline.colorspace import rgb_to_lab
+
+_OFFSETS = [(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1)]
+
+
+def slic_superpixels(
+    image: Image.Image, step: int, compactness: float = 10.0, iterations: int = 4
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Group pixels into roughly ``step``-sized superpixels (SLIC).
+
+    Returns ``(segments, means, counts)``: a ``(H, W)`` superpixel id per pixel,
+    numbered ``0..K-1``, the mean RGB color of each superpixel and its pixel count.
+
+    Centers start on a grid of ``step``-pixel cells and each pixel is compared only
+    with the centers of its own and the 8 neighboring cells, as in SLIC. The
+    (edge-padded) image is laid out as ``(rows, cols, step * step)`` blocks of
+    ``[L, a, b, y, x]`` features with the position scaled by ``compactness / step``,
+    so comparing every pixel of every cell with one neighboring center is a single
+    batched matrix product: ``|f - c|^2`` ranks like ``|c|^2 - 2 f.c``. Connectivity
+    is not enforced; stray fragments are left to the region merge that follows.
+    """
+
+    if step < 2:
+        raise ValueError("step must be at least 2")
+
+    rgb = np.asarray(image.convert("RGB"), dtype=np.uint8)
+    height, width, _ = rgb.shape
+    rows, cols = -(-height // step), -(-width // step)
+    padded = np.pad(
+        rgb, ((0, rows * step - height), (0, cols * step - width), (0, 0)), mode="edge"
+    )
+
+    scale = np.float32(compactness / step)
+    grid_shape = (rows * step, cols * step)
+    block_shape = (rows, cols, step * step)
+    valid = np.zeros(grid_shape, dtype=bool)
+    valid[:height, :width] = True
+    valid = _to_blocks(valid, step).reshape(-1)
+
+    with buffer_pool.borrow((*block_shape, 5), np.float32) as features:
+        with buffer_pool.borrow((*grid_shape, 5), np.float32) as grid:
+            grid[..., :3] = rgb_to_lab(padded, dtype=np.float32)
+            grid[..., 3] = np.arange(grid_shape[0], dtype=np.float32)[:, None] * scale
+            grid[..., 4] = np.arange(grid_shape[1], dtype=np.float32)[None, :] * scale
+            _to_blocks(grid, step, out=features)
+        labels = _cluster(features, valid, iterations)
+
+    labels = labels.reshape(rows, cols, step, step).swapaxes(1, 2)
+    labels = labels.reshape(grid_shape)[:height, :width].ravel()
+    counts = np.bincount(labels, minlength=rows * cols)
+    used = counts > 0
+    segments = (np.cumsum(used) - 1)[labels]
+    counts = counts[used]
+    flat_rgb = rgb.reshape(-1, 3)
+    means = np.empty((len(counts), 3))
+    for channel in range(3):
+        means[:, channel] = np.bincount(segments, weights=flat_rgb[:, channel])
+    means /= counts[:, None]
+    return segments.reshape(height, width).astype(np.int32), means, counts
+
+
+def _to_blocks(array: np.ndarray, step: int, out: np.ndarray | None = None) -> np.ndarray:
+    """Reorder a ``(rows * step, cols * step, ...)`` array into ``(rows, cols, step * step, ...)``."""
+
+    rows, cols = array.shape[0] // step, array.shape[1] // step
+    blocks = array.reshape(rows, step, cols, step, *array.shape[2:]).swapaxes(1, 2)
+    if out is None:
+        out = np.empty((rows, cols, step * step, *array.shape[2:]), dtype=array.dtype)
+    np.copyto(out.reshape(blocks.shape), blocks)
+    return out
+
+
+def _cluster(features: np.ndarray, valid: np.ndarray, iterations: int) -> np.ndarray:
+    """Run SLIC on ``(rows, cols, pixels, 5)`` features; return each pixel's center id.
+
+    The result is a fresh ``(rows, cols, pixels)`` array; the per-pass distance
+    buffers are borrowed from the pool.
+    """
+
+    rows, cols, pixels, _ = features.shape
+    step = int(round(pixels**0.5))
+    flat_features = features.reshape(-1, 5)[valid]
+    centers = features[:, :, (step // 2) * step + step // 2].copy()
+    row_ids, col_ids = np.arange(rows), np.arange(cols)
+    labels = np.empty((rows, cols, pixels), dtype=np.int32)
+    cells = rows * cols
+
+    with (
+        buffer_pool.borrow((rows, cols, pixels), np.float32) as best,
+        buffer_pool.borrow((rows, cols, pixels, 1), np.float32) as distance,
+        buffer_pool.borrow((rows, cols, pixels), bool) as closer,
+    ):
+        for iteration in range(iterations + 1):
+            best.fill(np.inf)
+            for dy, dx in _OFFSETS:
+                ny = np.clip(row_ids + dy, 0, rows - 1)[:, None]
+                nx = np.clip(col_ids + dx, 0, cols - 1)[None, :]
+                neighbor = centers[ny, nx]
+                np.matmul(features, neighbor[..., None], out=distance)
+                distance *= -2
+                distance += (neighbor**2).sum(axis=-1)[..., None, None]
+                np.less(distance[..., 0], best, out=closer)
+                np.copyto(best, distance[..., 0], where=closer)
+                np.copyto(labels, (ny * cols + nx)[..., None], where=closer)
+            if iteration == iterations:
+                break
+
+            assigned = labels.reshape(-1)[valid]
+            counts = np.bincount(assigned, minlength=cells)
+            live = counts > 0
+            flat_centers = centers.reshape(-1, 5)
+            for channel in range(5):
+                sums = np.bincount(assigned, weights=flat_features[:, channel], minlength=cells)
+                flat_centers[live, channel] = sums[live] / counts[live]
+    return labels
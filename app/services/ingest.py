@@ -0,0 +1,139 @@
+"""Streaming upload checks: size limit, content hash and image header sniffing."""
+
+from __future__ import annotations
+
+import hashlib
+import struct
+from dataclasses import dataclass
+
+CHUNK_SIZE = 64 * 1024
+# JPEG frame headers can sit behind large EXIF/ICC segments; give up past this.
+SNIFF_LIMIT = 1024 * 1024
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_SIGNATURE = b"\xff\xd8"
+# Start-of-frame markers carry the image size; C4, C8 and CC are other segments.
+_JPEG_FRAME_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Markers without a length field.
+_JPEG_STANDALONE_MARKERS = frozenset([0x01, *range(0xD0, 0xD8)])
+
+
+@dataclass(frozen=True)
+class ImageHeader:
+    """Format (as Pillow names it) and pixel size read from the first bytes of a file."""
+
+    format: str
+    width: int
+    height: int
+
+
+def sniff_image(head: bytes | bytearray) -> ImageHeader | None:
+    """Identify a PNG or JPEG from its leading bytes, without decoding it.
+
+    Returns ``None`` while ``head`` is too short to decide; raises ``ValueError`` for
+    other formats and malformed headers.
+    """
+
+    for signature in (PNG_SIGNATURE, JPEG_SIGNATURE):
+        if len(head) < len(signature) and signature.startswith(head):
+            return None
+    if head.startswith(PNG_SIGNATURE):
+        # The IHDR chunk must come first: length, type, then width and height.
+        if len(head) < 24:
+            return None
+        if head[12:16] != b"IHDR":
+            raise ValueError("Invalid image file")
+        width, height = struct.unpack(">II", head[16:24])
+        return ImageHeader("PNG", width, height)
+    if head.startswith(JPEG_SIGNATURE):
+        return _sniff_jpeg(head)
+    raise ValueError("Unsupported file type")
+
+
+def _sniff_jpeg(head: bytes | bytearray) -> ImageHeader | None:
+    """Walk the JPEG segments up to the first start-of-frame header."""
+
+    offset = len(JPEG_SIGNATURE)
+    while True:
+        if offset >= len(head):
+            return None
+        if head[offset] != 0xFF:
+            raise ValueError("Invalid image file")
+        while offset < len(head) and head[offset] == 0xFF:  # fill bytes
+            offset += 1
+        if offset >= len(head):
+            return None
+        marker = head[offset]
+        offset += 1
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (0x00, 0xD9, 0xDA):  # stuffing, end of image or scan before a frame
+            raise ValueError("Invalid image file")
+        if offset + 2 > len(head):
+            return None
+        (length,) = struct.unpack(">H", head[offset : offset + 2])
+        if length < 2:
+            raise ValueError("Invalid image file")
+        if marker in _JPEG_FRAME_MARKERS:
+            if offset + 7 > len(head):
+                return None
+            height, width = struct.unpack(">HH", head[offset + 3 : offset + 7])
+            return ImageHeader("JPEG", width, height)
+        offset += length
+
+
+class UploadIngest:
+    """Checks an upload chunk by chunk as it is read.
+
+    Every chunk updates a SHA-256 of the content (usable as a cache or dedup key)
+    and the size limit is enforced as soon as it is crossed. Until the image header
+    has been found the leading bytes are kept and sniffed, so a non-image or an
+    image over ``max_pixels`` is rejected after its first chunk, before the rest is
+    read or anything is decoded. Rejections raise ``ValueError``.
+    """
+
+    def __init__(self, max_bytes: int, max_pixels: int) -> None:
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.size = 0
+        self.header: ImageHeader | None = None
+        self._hash = hashlib.sha256()
+        self._head = bytearray()
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def feed(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise ValueError("File too large")
+        self._hash.update(chunk)
+        if self.header is None:
+            self._head += chunk[: SNIFF_LIMIT - len(self._head)]
+            self._check_header()
+
+    def finish(self) -> ImageHeader:
+        """The sniffed header once the whole upload has been fed."""
+
+        if self.size == 0:
+            raise ValueError("File is empty")
+        if self.header is None:
+            raise ValueError("Invalid image file")
+        return self.header
+
+    def _check_header(self) -> None:
+        header = sniff_image(self._head)
+        if header is None:
+            if len(self._head) >= SNIFF_LIMIT:
+                raise ValueError("Invalid image file")
+            return
+        if header.width == 0 or header.height == 0:
+            raise ValueError("Invalid image file")
+        if header.width * header.height > self.max_pixels:
+            raise ValueError(
+                f"Image is {header.width}x{header.height}; "
+                f"at most {self.max_pixels} pixels are accepted"
+            )
+        self.header = header
+        self._head = bytearray()
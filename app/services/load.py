@@ -0,0 +1,95 @@
+"""Worker load snapshot for readiness checks: jobs, latency percentiles and RSS."""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator
+
+from app.core.config import settings
+from app.services.admission import AdmissionController, admission
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss_mb() -> float | None:
+    """Resident set size of this process from ``/proc/self/statm``; ``None`` off Linux."""
+
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending, non-empty list."""
+
+    return ordered[max(1, math.ceil(len(ordered) * fraction)) - 1]
+
+
+class LoadTracker:
+    """Recent pipeline latencies plus the admission counters, summarized for ``/ready``.
+
+    ``snapshot`` reads the admission controller, so like it, it must run on the
+    event loop; it never waits on the pipeline, so it stays cheap to poll while jobs
+    run in the thread pool. ``record`` may be called from any thread.
+    """
+
+    def __init__(self, controller: AdmissionController, window: int) -> None:
+        self.controller = controller
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    @contextmanager
+    def timed(self) -> Iterator[None]:
+        """Record the wall time of the ``with`` block when it completes without error."""
+
+        start = time.perf_counter()
+        yield
+        self.record(time.perf_counter() - start)
+
+    def snapshot(self) -> dict[str, object]:
+        with self._lock:
+            ordered = sorted(self._latencies)
+        in_flight, queued = self.controller.running, self.controller.queued
+        rss_mb = current_rss_mb()
+        p50 = _percentile(ordered, 0.5) if ordered else None
+        p95 = _percentile(ordered, 0.95) if ordered else None
+
+        max_in_flight = settings.ready_max_in_flight or self.controller.max_concurrent_jobs
+        reasons = []
+        if in_flight >= max_in_flight:
+            reasons.append("in_flight")
+        if queued > settings.ready_max_queued:
+            reasons.append("queued")
+        if settings.ready_max_p95_seconds is not None and p95 is not None:
+            if p95 > settings.ready_max_p95_seconds:
+                reasons.append("latency")
+        if settings.ready_max_rss_mb is not None and rss_mb is not None:
+            if rss_mb > settings.ready_max_rss_mb:
+                reasons.append("memory")
+
+        return {
+            "status": "saturated" if reasons else "ready",
+            "reasons": reasons,
+            "in_flight": in_flight,
+            "queued": queued,
+            "latency_s": {
+                "p50": round(p50, 3) if p50 is not None else None,
+                "p95": round(p95, 3) if p95 is not None else None,
+                "samples": len(ordered),
+            },
+            "rss_mb": round(rss_mb, 1) if rss_mb is not None else None,
+        }
+
+
+load_tracker = LoadTracker(admission, settings.ready_latency_window)
@@ -0,0 +1,122 @@
+"""Opt-in per-request profiling with captures written to a size-capped directory."""
+
+from __future__ import annotations
+
+import cProfile
+import hashlib
+import json
+import random
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator
+
+from app.core.config import settings
+
+PROFILE_FILE = "profile.pstats"
+REQUEST_FILE = "request.json"
+INPUT_FILE = "input.bin"
+
+# cProfile hooks one thread and profiles are large; capture one request at a time.
+_capture_lock = threading.Lock()
+
+
+@dataclass
+class ProfileCapture:
+    """A captured request: ``directory`` holds the profile, parameters and input."""
+
+    capture_id: str
+    directory: Path
+    params: dict[str, object]
+    sha256: str
+    profiler: cProfile.Profile = field(default_factory=cProfile.Profile, repr=False)
+
+
+def should_profile(requested: bool) -> bool:
+    """Profile when enabled and either ``requested`` or picked by the sample rate."""
+
+    if not settings.profiling_enabled:
+        return False
+    return requested or random.random() < settings.profiling_sample_rate
+
+
+def capture_size(directory: Path) -> int:
+    return sum(path.stat().st_size for path in directory.rglob("*") if path.is_file())
+
+
+def enforce_disk_cap(root: Path, max_bytes: int) -> list[Path]:
+    """Delete the oldest captures under ``root`` until they fit in ``max_bytes``."""
+
+    captures = sorted(
+        (path for path in root.iterdir() if (path / REQUEST_FILE).exists()),
+        key=lambda path: path.stat().st_mtime,
+    )
+    sizes = {path: capture_size(path) for path in captures}
+    total = sum(sizes.values())
+    removed = []
+    for path in captures:
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= sizes[path]
+        removed.append(path)
+    return removed
+
+
+@contextmanager
+def profile_request(
+    enabled: bool, *, params: dict[str, object], source: bytes
+) -> Iterator[ProfileCapture | None]:
+    """Profile the ``with`` body when ``enabled`` and no other capture is running.
+
+    Yields the capture (``None`` when not profiling). On exit the profile, the
+    request parameters with the input's SHA-256 and timing, and the input bytes are
+    written to a new directory under ``settings.profiling_dir``, then the oldest
+    captures are evicted to respect ``settings.profiling_max_bytes``.
+    """
+
+    if not enabled or not _capture_lock.acquire(blocking=False):
+        yield None
+        return
+
+    try:
+        root = Path(settings.profiling_dir)
+        capture_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        capture = ProfileCapture(
+            capture_id=capture_id,
+            directory=root / capture_id,
+            params=params,
+            sha256=hashlib.sha256(source).hexdigest(),
+        )
+        start = time.perf_counter()
+        capture.profiler.enable()
+        try:
+            yield capture
+        finally:
+            capture.profiler.disable()
+            elapsed = time.perf_counter() - start
+
+        capture.directory.mkdir(parents=True, exist_ok=True)
+        capture.profiler.dump_stats(capture.directory / PROFILE_FILE)
+        (capture.directory / INPUT_FILE).write_bytes(source)
+        (capture.directory / REQUEST_FILE).write_text(
+            json.dumps(
+                {
+                    "capture_id": capture_id,
+                    "params": params,
+                    "sha256": capture.sha256,
+                    "input_bytes": len(source),
+                    "elapsed_s": round(elapsed, 4),
+                },
+                indent=2,
+                sort_keys=True,
+            )
+            + "\n"
+        )
+        enforce_disk_cap(root, settings.profiling_max_bytes)
+    finally:
+        _capture_lock.release()
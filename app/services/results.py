@@ -0,0 +1,40 @@
+"""In-memory store of editable results keyed by opaque ids."""
+
+from __future__ import annotations
+
+import threading
+import uuid
+from collections import OrderedDict
+
+from app.core.config import settings
+from app.services.image_pipeline.region_model import RegionModel
+
+
+class ResultStore:
+    """Keep the ``max_entries`` most recently used region models."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, RegionModel] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, model: RegionModel) -> str:
+        result_id = uuid.uuid4().hex
+        with self._lock:
+            self._entries[result_id] = model
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result_id
+
+    def get(self, result_id: str) -> RegionModel | None:
+        with self._lock:
+            model = self._entries.get(result_id)
+            if model is not None:
+                self._entries.move_to_end(result_id)
+            return model
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+result_store = ResultStore(settings.result_store_max_entries)
@@ -0,0 +1,571 @@
+"""Benchmark the image pipeline stages and the /generate endpoint.
+
+Runs every stage of ``app.services.image_pipeline`` plus a full ``POST /generate/``
+round trip over synthetic inputs (gradients, noise, flat shapes) and ``test-image.png``,
+writes the timings as JSON and compares them against a committed baseline. It also
+records the peak memory of building the outline page on a Letter-size label map, the
+separate outline image + RGB conversion against the fused canvas, each in a fresh
+process, and the mean color error of quantizing in sRGB against CIELAB.
+
+Usage::
+
+    python scripts/benchmark_pipeline.py                    # run + compare to baseline
+    python scripts/benchmark_pipeline.py --update-baseline  # run + overwrite baseline
+
+Timings are only compared when the baseline's host metadata (host name, CPU,
+Python and NumPy versions) matches the current machine; otherwise the run reports
+the mismatch and exits cleanly unless ``--any-host`` is given.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.core.config import settings  # noqa: E402
+from app.services.image_pipeline.colorspace import rgb_to_lab  # noqa: E402
+from app.services.image_pipeline.io import load_and_resize  # noqa: E402
+from app.services.image_pipeline.numbering import (  # noqa: E402
+    add_numbers,
+    render_numbered_outline,
+)
+from app.services.image_pipeline.outline import (  # noqa: E402
+    compute_borders,
+    make_outline_image,
+    paint_borders,
+)
+from app.services.image_pipeline.palette import (  # noqa: E402
+    build_palette_metadata,
+    render_painted_preview,
+    render_palette_pdf,
+)
+from app.services.image_pipeline.prefilter import prefilter_image  # noqa: E402
+from app.services.image_pipeline.paints import load_paint_inventory  # noqa: E402
+from app.services.image_pipeline.quantize import (  # noqa: E402
+    assign_paints,
+    quantize_colors,
+    quantize_superpixels,
+    snap_to_paints,
+)
+from app.services.image_pipeline.regions import (  # noqa: E402
+    merge_small_regions,
+    merge_small_regions_counted,
+)
+
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baseline.json"
+DEFAULT_OUTPUT = ROOT / "benchmarks" / "results.json"
+
+SIZES: dict[str, tuple[int, int]] = {
+    "small": (400, 300),
+    "medium": (640, 480),
+}
+NUM_COLORS = 10
+MIN_REGION_SIZE = 300
+PREFILTER_STRENGTH = 2
+LETTER_SIZE = (2550, 3300)
+PAGE_TIMEOUT_S = 120
+HOST_KEYS = ("host", "machine", "processor", "cpu_count", "python", "numpy")
+
+
+def make_gradient(width: int, height: int) -> Image.Image:
+    """Smooth diagonal gradient: few, large, banded regions."""
+
+    xs = np.linspace(0, 255, width, dtype=np.float32)
+    ys = np.linspace(0, 255, height, dtype=np.float32)
+    red = np.broadcast_to(xs, (height, width))
+    green = np.broadcast_to(ys[:, None], (height, width))
+    blue = (red + green) / 2
+    array = np.stack([red, green, blue], axis=-1).astype(np.uint8)
+    return Image.fromarray(array, mode="RGB")
+
+
+def make_noise(width: int, height: int) -> Image.Image:
+    """Uniform RGB noise: worst case for region fragmentation."""
+
+    rng = np.random.default_rng(0)
+    array = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    return Image.fromarray(array, mode="RGB")
+
+
+def make_shapes(width: int, height: int) -> Image.Image:
+    """Flat rectangles and ellipses on a plain background."""
+
+    rng = np.random.default_rng(1)
+    image = Image.new("RGB", (width, height), (240, 240, 230))
+    draw = ImageDraw.Draw(image)
+    for _ in range(24):
+        x0, x1 = sorted(int(v) for v in rng.integers(0, width, size=2))
+        y0, y1 = sorted(int(v) for v in rng.integers(0, height, size=2))
+        color = tuple(int(c) for c in rng.integers(0, 256, size=3))
+        if rng.random() < 0.5:
+            draw.rectangle((x0, y0, x1, y1), fill=color)
+        else:
+            draw.ellipse((x0, y0, x1, y1), fill=color)
+    return image
+
+
+GENERATORS: dict[str, Callable[[int, int], Image.Image]] = {
+    "gradient": make_gradient,
+    "noise": make_noise,
+    "shapes": make_shapes,
+}
+
+
+def _png_bytes(image: Image.Image) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def build_cases() -> dict[str, tuple[bytes, int]]:
+    """Return ``{case_name: (png_bytes, max_width)}`` for every benchmark input."""
+
+    cases: dict[str, tuple[bytes, int]] = {}
+    for size_name, (width, height) in SIZES.items():
+        for kind, generator in GENERATORS.items():
+            cases[f"{kind}-{size_name}"] = (_png_bytes(generator(width, height)), width)
+
+    sample = ROOT / "test-image.png"
+    if sample.exists():
+        data = sample.read_bytes()
+        for size_name, (width, _) in SIZES.items():
+            cases[f"test-image-{size_name}"] = (data, width)
+    return cases
+
+
+def _time(func: Callable[[], object], repeat: int) -> dict[str, float]:
+    func()  # warm-up: first calls pay for lazy imports, font loading and caches
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {
+        "median_s": round(statistics.median(samples), 6),
+        "min_s": round(min(samples), 6),
+    }
+
+
+def count_components(data: bytes, max_width: int) -> dict[str, int]:
+    """Connected components after quantization with the pre-filter off and on, and
+    after superpixel quantization."""
+
+    counts: dict[str, int] = {}
+    resized = load_and_resize(BytesIO(data), max_width)
+    for name, strength in (("off", 0), ("on", PREFILTER_STRENGTH)):
+        label_img, _ = quantize_colors(prefilter_image(resized, strength), NUM_COLORS)
+        _, stats = merge_small_regions_counted(label_img, MIN_REGION_SIZE)
+        counts[name] = stats.components
+    label_img, _ = quantize_superpixels(resized, NUM_COLORS, settings.superpixel_size)
+    _, stats = merge_small_regions_counted(label_img, MIN_REGION_SIZE)
+    counts["superpixels"] = stats.components
+    return counts
+
+
+def color_error(data: bytes, max_width: int) -> dict[str, float]:
+    """Mean Delta-E (CIE76) between each pixel and its palette color, per color space."""
+
+    resized = load_and_resize(BytesIO(data), max_width)
+    pixels = rgb_to_lab(np.asarray(resized.convert("RGB"), dtype=np.uint8))
+    errors: dict[str, float] = {}
+    for color_space in ("rgb", "lab"):
+        label_img, palette = quantize_colors(resized, NUM_COLORS, color_space=color_space)
+        distance = np.linalg.norm(pixels - rgb_to_lab(palette)[label_img], axis=-1)
+        errors[color_space] = round(float(distance.mean()), 3)
+    return errors
+
+
+def bench_case(data: bytes, max_width: int, repeat: int, client) -> dict[str, dict[str, float]]:
+    """Time each stage in isolation, feeding it the output of the previous stage."""
+
+    results: dict[str, dict[str, float]] = {}
+
+    results["load_and_resize"] = _time(lambda: load_and_resize(BytesIO(data), max_width), repeat)
+    resized = load_and_resize(BytesIO(data), max_width)
+
+    results["prefilter_image"] = _time(
+        lambda: prefilter_image(resized, PREFILTER_STRENGTH), repeat
+    )
+    results["quantize_colors"] = _time(lambda: quantize_colors(resized, NUM_COLORS), repeat)
+    results["quantize_colors_lab"] = _time(
+        lambda: quantize_colors(resized, NUM_COLORS, color_space="lab"), repeat
+    )
+    label_img, palette = quantize_colors(resized, NUM_COLORS)
+    results["quantize_superpixels"] = _time(
+        lambda: quantize_superpixels(resized, NUM_COLORS, settings.superpixel_size), repeat
+    )
+
+    # The paint modes against the fitted palette: snapping adds a lookup after
+    # k-means, assigning to the snapped paints skips k-means altogether.
+    inventory = load_paint_inventory()
+    results["snap_to_paints"] = _time(
+        lambda: snap_to_paints(label_img, palette, inventory), repeat
+    )
+    _, _, snapped = snap_to_paints(label_img, palette, inventory)
+    paint_codes = [paint.code for paint in snapped]
+    chosen = inventory.subset(paint_codes)
+    results["assign_paints"] = _time(lambda: assign_paints(resized, chosen), repeat)
+
+    results["merge_small_regions"] = _time(
+        lambda: merge_small_regions(label_img, MIN_REGION_SIZE), repeat
+    )
+    merged = merge_small_regions(label_img, MIN_REGION_SIZE)
+
+    results["make_outline_image"] = _time(lambda: make_outline_image(merged), repeat)
+    outline_img = make_outline_image(merged)
+
+    results["add_numbers"] = _time(
+        lambda: add_numbers(outline_img, merged, palette, MIN_REGION_SIZE), repeat
+    )
+    results["render_numbered_outline"] = _time(
+        lambda: render_numbered_outline(merged, MIN_REGION_SIZE, mode="L"), repeat
+    )
+    results["render_painted_preview"] = _time(
+        lambda: render_painted_preview(merged, palette), repeat
+    )
+
+    metadata = build_palette_metadata(palette)
+    results["render_palette_pdf"] = _time(lambda: render_palette_pdf(metadata), repeat)
+
+    def post(**extra: str) -> None:
+        response = client.post(
+            "/generate/",
+            data={
+                "num_colors": str(NUM_COLORS),
+                "max_width": str(max_width),
+                "min_region_size": str(MIN_REGION_SIZE),
+                **extra,
+            },
+            files={"file": ("bench.png", data, "image/png")},
+        )
+        response.raise_for_status()
+
+    results["generate_endpoint"] = _time(post, repeat)
+    results["generate_endpoint_prefilter"] = _time(
+        lambda: post(prefilter_strength=str(PREFILTER_STRENGTH)), repeat
+    )
+    results["generate_endpoint_superpixels"] = _time(
+        lambda: post(segmentation="superpixels"), repeat
+    )
+    results["generate_endpoint_lab"] = _time(lambda: post(color_space="lab"), repeat)
+    if len(paint_codes) >= settings.min_colors:
+        results["generate_endpoint_inventory"] = _time(
+            lambda: post(palette_mode="inventory", paints=",".join(paint_codes)), repeat
+        )
+    return results
+
+
+def _letter_labels() -> np.ndarray:
+    """Letter-size (2550x3300) label map of 100 px blocks in 10 colors, built in place."""
+
+    rng = np.random.default_rng(2)
+    grid = rng.integers(0, NUM_COLORS, size=(33, 26)).astype(np.int32)
+    rows = np.arange(LETTER_SIZE[1]) // 100
+    cols = np.arange(LETTER_SIZE[0]) // 100
+    return grid[rows][:, cols]
+
+
+def _separate_page(labels: np.ndarray) -> Image.Image:
+    return make_outline_image(labels).convert("RGB")
+
+
+def _fused_page(labels: np.ndarray, mode: str) -> Image.Image:
+    # The body of render_numbered_outline up to numbering, which both paths share.
+    page = Image.new(mode, (labels.shape[1], labels.shape[0]), "white")
+    paint_borders(page, compute_borders(labels))
+    return page
+
+
+PAGE_BUILDERS: dict[str, Callable[[np.ndarray], Image.Image]] = {
+    "separate_rgb": _separate_page,
+    "fused_rgb": lambda labels: _fused_page(labels, "RGB"),
+    "fused_l": lambda labels: _fused_page(labels, "L"),
+}
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        pages = int(statm.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS (VmHWM) so import-time peaks are not counted."""
+
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def _peak_rss_mb() -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def _measure_page(name: str, queue) -> None:
+    labels = _letter_labels()
+    gc.collect()
+    _reset_peak_rss()
+    before = _rss_mb()
+    tracemalloc.start()
+    start = time.perf_counter()
+    page = PAGE_BUILDERS[name](labels)
+    elapsed = time.perf_counter() - start
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    peak = _peak_rss_mb()
+    queue.put(
+        {
+            "seconds": round(elapsed, 4),
+            "peak_rss_mb": round(peak - before, 1),
+            "tracemalloc_peak_mb": round(traced_peak / 2**20, 1),
+            "page_mb": round(len(page.tobytes()) / 2**20, 1),
+        }
+    )
+
+
+def measure_page_memory() -> dict[str, dict[str, float]]:
+    """Peak memory above the label map for each way of building the Letter outline page.
+
+    ``peak_rss_mb`` includes Pillow's image buffers, which ``tracemalloc`` does not
+    see; each builder runs in a fresh spawned process so peaks do not carry over.
+    """
+
+    context = multiprocessing.get_context("spawn")
+    results: dict[str, dict[str, float]] = {}
+    for name in PAGE_BUILDERS:
+        queue = context.Queue()
+        process = context.Process(target=_measure_page, args=(name, queue))
+        process.start()
+        try:
+            results[f"letter/{name}"] = queue.get(timeout=PAGE_TIMEOUT_S)
+        finally:
+            process.join()
+    return results
+
+
+def run(repeat: int, only: str | None = None) -> dict[str, object]:
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    client = TestClient(app)
+    calibration = calibrate()
+    results: dict[str, dict[str, float]] = {}
+    components: dict[str, dict[str, int]] = {}
+    errors: dict[str, dict[str, float]] = {}
+    for case_name, (data, max_width) in build_cases().items():
+        if only and only not in case_name:
+            continue
+        print(f"benchmarking {case_name} ...", file=sys.stderr)
+        for stage, timing in bench_case(data, max_width, repeat, client).items():
+            results[f"{case_name}/{stage}"] = timing
+        components[case_name] = count_components(data, max_width)
+        errors[case_name] = color_error(data, max_width)
+
+    print("measuring Letter page memory ...", file=sys.stderr)
+    memory = measure_page_memory()
+
+    return {
+        "meta": {
+            **host_info(),
+            "calibration_s": calibration,
+            "repeat": repeat,
+            "num_colors": NUM_COLORS,
+            "min_region_size": MIN_REGION_SIZE,
+            "prefilter_strength": PREFILTER_STRENGTH,
+        },
+        "components": components,
+        "color_error": errors,
+        "memory": memory,
+        "results": results,
+    }
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def calibrate(repeat: int = 5) -> float:
+    """Median seconds for a fixed mix of pure-Python BFS and NumPy work.
+
+    Stored with every run so ``compare`` can scale the baseline by how fast this
+    machine is right now (shared or throttled hosts drift between runs).
+    """
+
+    rng = np.random.default_rng(3)
+    labels = rng.integers(0, 4, size=(160, 160))
+    pixels = rng.random((400, 400, 3))
+
+    def workload() -> None:
+        merge_small_regions_counted(labels, 8)
+        np.sort(pixels.reshape(-1, 3), axis=0)
+
+    return _time(workload, repeat)["median_s"]
+
+
+def host_info() -> dict[str, object]:
+    """What makes absolute timings comparable: same host, CPU and interpreter stack."""
+
+    return {
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "processor": _cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def host_mismatch(current: dict[str, object], baseline: dict[str, object]) -> list[str]:
+    """Return ``key: baseline -> current`` lines for host fields that differ."""
+
+    base_meta = baseline.get("meta", {})
+    return [
+        f"{key}: {base_meta.get(key)!r} -> {value!r}"
+        for key, value in current["meta"].items()
+        if key in HOST_KEYS and base_meta.get(key) != value
+    ]
+
+
+def compare(
+    current: dict[str, object],
+    baseline: dict[str, object],
+    tolerance: float,
+    min_delta_s: float,
+) -> list[str]:
+    """Return human readable regressions where ``current`` is slower than ``baseline``.
+
+    A key regresses when its median exceeds the baseline median by more than
+    ``tolerance`` (relative) *and* ``min_delta_s`` (absolute), so sub-millisecond
+    stages do not flap on scheduler noise. Baseline medians are first scaled by the
+    ratio of the two runs' calibration timings, when both have one.
+    """
+
+    regressions: list[str] = []
+    base_results = baseline.get("results", {})
+    scale = 1.0
+    now_cal = current["meta"].get("calibration_s")
+    base_cal = baseline.get("meta", {}).get("calibration_s")
+    if now_cal and base_cal:
+        scale = now_cal / base_cal
+    for key, timing in current["results"].items():
+        base = base_results.get(key)
+        if base is None:
+            continue
+        now, before = timing["median_s"], base["median_s"] * scale
+        if now > before * (1 + tolerance) and now - before > min_delta_s:
+            regressions.append(f"{key}: {before:.4f}s -> {now:.4f}s (+{(now / before - 1):.0%})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement")
+    parser.add_argument("--only", help="only run cases whose name contains this substring")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="allowed relative slowdown (0.25 = 25%%)"
+    )
+    parser.add_argument(
+        "--min-delta", type=float, default=0.005, help="ignore slowdowns below this many seconds"
+    )
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument(
+        "--any-host",
+        action="store_true",
+        help="enforce the baseline even if it was recorded on a different host",
+    )
+    args = parser.parse_args()
+
+    current = run(args.repeat, args.only)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(current, indent=2, sort_keys=True) + "\n")
+    print(f"Wrote {args.output}")
+    for case_name, errors in current["color_error"].items():
+        print(f"  {case_name}: mean Delta-E rgb {errors['rgb']} / lab {errors['lab']}")
+    for key, usage in current["memory"].items():
+        print(
+            f"  {key}: peak {usage['peak_rss_mb']} MB RSS"
+            f" ({usage['tracemalloc_peak_mb']} MB traced), {usage['seconds']}s"
+        )
+
+    if args.update_baseline:
+        # Merge so that ``--only`` runs refresh just the selected cases.
+        if args.baseline.exists():
+            merged = json.loads(args.baseline.read_text())
+            merged["meta"] = current["meta"]
+            merged.setdefault("components", {}).update(current["components"])
+            merged.setdefault("color_error", {}).update(current["color_error"])
+            merged["memory"] = current["memory"]
+            merged["results"].update(current["results"])
+            current = merged
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(current, indent=2, sort_keys=True) + "\n")
+        print(f"Wrote {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())
+    mismatch = host_mismatch(current, baseline)
+    if mismatch and not args.any_host:
+        # Absolute timings from another machine say nothing about this change.
+        print(f"{args.baseline} was recorded on a different host; not comparing:")
+        for line in mismatch:
+            print(f"  {line}")
+        print("Record a local baseline with --update-baseline, or pass --any-host.")
+        return 0
+
+    regressions = compare(current, baseline, args.tolerance, args.min_delta)
+    base_cal = baseline["meta"].get("calibration_s")
+    if base_cal:
+        print(f"Host speed vs baseline: {base_cal / current['meta']['calibration_s']:.2f}x")
+    if regressions:
+        print("Performance regressions against baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+
+    print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
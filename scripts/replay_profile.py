@@ -0,0 +1,74 @@
+"""Replay a captured /generate request under cProfile and print the hottest functions.
+
+A capture is a directory written by ``app.services.profiling`` when profiling is
+enabled: ``profile.pstats``, ``request.json`` and the input bytes. The replay runs
+the same response-building code path as the endpoint, on one thread, with the
+captured parameters.
+
+Usage::
+
+    python scripts/replay_profile.py profiles/<capture-id>            # re-run + profile
+    python scripts/replay_profile.py profiles/<capture-id> --stored   # captured profile
+    python scripts/replay_profile.py profiles/<capture-id> --sort tottime --limit 40
+"""
+
+from __future__ import annotations
+
+import argparse
+import cProfile
+import hashlib
+import json
+import pstats
+import sys
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.api.generate import _build_response  # noqa: E402
+from app.services.profiling import INPUT_FILE, PROFILE_FILE, REQUEST_FILE  # noqa: E402
+
+
+def replay(capture: Path) -> cProfile.Profile:
+    request = json.loads((capture / REQUEST_FILE).read_text())
+    source = (capture / INPUT_FILE).read_bytes()
+    if hashlib.sha256(source).hexdigest() != request["sha256"]:
+        raise ValueError(f"{capture / INPUT_FILE} does not match the recorded SHA-256")
+
+    image = Image.open(BytesIO(source))
+    profiler = cProfile.Profile()
+    profiler.enable()
+    _build_response(image, None, concurrent=False, **request["params"])
+    profiler.disable()
+    return profiler
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", type=Path, help="capture directory")
+    parser.add_argument("--sort", default="cumulative", help="pstats sort key")
+    parser.add_argument("--limit", type=int, default=25, help="rows to print")
+    parser.add_argument(
+        "--stored", action="store_true", help="print the captured profile instead of re-running"
+    )
+    args = parser.parse_args()
+
+    if not (args.capture / REQUEST_FILE).exists():
+        print(f"{args.capture} is not a profile capture", file=sys.stderr)
+        return 1
+
+    if args.stored:
+        stats = pstats.Stats(str(args.capture / PROFILE_FILE))
+    else:
+        stats = pstats.Stats(replay(args.capture))
+    print(json.dumps(json.loads((args.capture / REQUEST_FILE).read_text()), indent=2))
+    stats.strip_dirs().sort_stats(args.sort).print_stats(args.limit)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Soak ``POST /generate/`` in-process and check that resident memory stays flat.
+
+Sends ``--requests`` generations over a rotating set of synthetic images (three
+sizes, so the buffer pool holds several shapes), sampling the process RSS from
+``/proc/self/statm``. RSS growth is measured from the end of the warm-up, when
+every buffer and per-thread ``BytesIO`` has reached its working size; the run
+fails when it grows by more than ``--max-growth-mb``.
+
+Usage::
+
+    python scripts/soak_rss.py                     # 500 requests with the buffer pool
+    python scripts/soak_rss.py --no-pool           # same, allocating fresh scratch arrays
+    python scripts/soak_rss.py --requests 100 --output soak.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.services.image_pipeline.buffers import buffer_pool  # noqa: E402
+
+SIZES = ((400, 300), (640, 480), (800, 600))
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * PAGE_SIZE / (1024 * 1024)
+
+
+def make_input(width: int, height: int, seed: int) -> bytes:
+    rng = np.random.default_rng(seed)
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for _ in range(25):
+        x0, y0 = int(rng.integers(0, width - 40)), int(rng.integers(0, height - 40))
+        x1, y1 = x0 + int(rng.integers(30, width // 3)), y0 + int(rng.integers(30, height // 3))
+        draw.rectangle((x0, y0, x1, y1), fill=tuple(int(c) for c in rng.integers(0, 256, 3)))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def soak(requests: int, warmup: int, sample_every: int) -> dict[str, object]:
+    client = TestClient(app)
+    inputs = [make_input(width, height, seed) for seed, (width, height) in enumerate(SIZES)]
+    samples: list[tuple[int, float]] = []
+    baseline = None
+    start = time.perf_counter()
+    for index in range(1, requests + 1):
+        data = inputs[index % len(inputs)]
+        response = client.post(
+            "/generate/",
+            data={"num_colors": "8", "max_width": "800", "min_region_size": "100"},
+            files={"file": ("soak.png", data, "image/png")},
+        )
+        response.raise_for_status()
+        if index == warmup:
+            baseline = rss_mb()
+        if index % sample_every == 0 or index == requests:
+            samples.append((index, round(rss_mb(), 1)))
+            print(f"  {index:4d} requests: {samples[-1][1]:.1f} MB RSS", flush=True)
+
+    final = rss_mb()
+    return {
+        "requests": requests,
+        "warmup": warmup,
+        "seconds": round(time.perf_counter() - start, 1),
+        "rss_after_warmup_mb": round(baseline if baseline is not None else final, 1),
+        "rss_final_mb": round(final, 1),
+        "growth_mb": round(final - (baseline if baseline is not None else final), 1),
+        "samples": samples,
+        "buffer_pool": buffer_pool.snapshot(),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=50, help="requests before measuring")
+    parser.add_argument("--sample-every", type=int, default=25)
+    parser.add_argument("--max-growth-mb", type=float, default=25.0)
+    parser.add_argument("--no-pool", action="store_true", help="disable the buffer pool")
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    args = parser.parse_args()
+
+    if not Path("/proc/self/statm").exists():
+        print("RSS sampling needs /proc (Linux)", file=sys.stderr)
+        return 1
+    if args.no_pool:
+        buffer_pool.configure(0)
+
+    report = soak(args.requests, min(args.warmup, args.requests), args.sample_every)
+    report["pool"] = not args.no_pool
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    print(
+        f"RSS {report['rss_after_warmup_mb']} MB after warm-up -> {report['rss_final_mb']} MB "
+        f"after {args.requests} requests ({report['growth_mb']:+} MB) in {report['seconds']} s"
+    )
+    if report["growth_mb"] > args.max_growth_mb:
+        print(f"RSS grew by more than {args.max_growth_mb} MB", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
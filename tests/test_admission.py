@@ -0,0 +1,98 @@
+import asyncio
+
+from app.services.admission import AdmissionController, AdmissionRejected, estimate_job_cost
+
+
+def _controller(**overrides):
+    options = {
+        "max_concurrent_jobs": 1,
+        "max_queued": 10,
+        "client_max_concurrent": 1,
+        "client_max_cost": 100.0,
+        "client_max_queued": 10,
+        "cost_per_second": 2.0,
+    }
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+def test_estimate_job_cost_uses_resized_dimensions():
+    assert estimate_job_cost(1000, 500, 2000, 10) == 5.0
+    assert estimate_job_cost(4000, 2000, 1000, 10) == 5.0
+
+
+def test_admission_interleaves_clients_fairly():
+    async def scenario():
+        controller = _controller()
+        order = []
+        gate = asyncio.Event()
+
+        async def job(client, cost, name):
+            async with controller.slot(client, cost):
+                order.append(name)
+                await gate.wait()
+
+        tasks = [asyncio.create_task(job("heavy", 10.0, "heavy-0"))]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(job("heavy", 10.0, f"heavy-{i}")) for i in (1, 2)]
+        tasks.append(asyncio.create_task(job("light", 1.0, "light-0")))
+        await asyncio.sleep(0)
+        assert controller.snapshot()["queued"] == 3
+
+        gate.set()
+        await asyncio.gather(*tasks)
+        return order, controller
+
+    order, controller = asyncio.run(scenario())
+
+    assert order == ["heavy-0", "light-0", "heavy-1", "heavy-2"]
+    assert controller.snapshot()["clients"]["heavy"]["completed"] == 3
+    assert controller.running == 0
+
+
+def test_admission_rejects_over_quota_with_retry_after():
+    async def scenario():
+        controller = _controller(max_concurrent_jobs=2, client_max_cost=15.0)
+        await controller.acquire("a", 10.0)
+        try:
+            await controller.acquire("a", 10.0)
+        except AdmissionRejected as exc:
+            error = exc
+        else:
+            error = None
+        await controller.acquire("b", 10.0)  # other clients are unaffected
+        return error, controller
+
+    error, controller = asyncio.run(scenario())
+
+    assert error is not None
+    assert error.retry_after == 5
+    assert controller.snapshot()["running"] == 2
+
+
+def test_admission_rejects_oversized_jobs_and_full_queue():
+    async def scenario():
+        controller = _controller(max_queued=1)
+        errors = []
+        try:
+            await controller.acquire("a", 150.0)
+        except AdmissionRejected as exc:
+            errors.append(exc)
+        await controller.acquire("a", 1.0)
+        waiting = asyncio.create_task(controller.acquire("b", 1.0))
+        await asyncio.sleep(0)
+        try:
+            await controller.acquire("c", 1.0)
+        except AdmissionRejected as exc:
+            errors.append(exc)
+        waiting.cancel()
+        return errors, controller
+
+    errors, controller = asyncio.run(scenario())
+
+    assert [error.reason for error in errors] == [
+        "job exceeds the per-client cost quota",
+        "server busy",
+    ]
+    assert errors[0].retry_after is None
+    assert controller.snapshot()["queued"] == 0
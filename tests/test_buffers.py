@@ -0,0 +1,45 @@
+import numpy as np
+
+from app.services.image_pipeline.buffers import BufferPool
+
+
+def test_buffer_pool_reuses_arrays_by_shape_and_dtype():
+    pool = BufferPool(max_bytes=1024)
+
+    with pool.borrow((4, 4), bool) as first:
+        pass
+    with pool.borrow((4, 4), bool) as second:
+        assert second is first
+    with pool.borrow((4, 4), np.uint8) as other:
+        assert other is not first
+
+    assert pool.snapshot()["hits"] == 1
+    assert pool.snapshot()["misses"] == 2
+
+
+def test_buffer_pool_evicts_least_recently_returned_shapes():
+    pool = BufferPool(max_bytes=200)
+
+    pool.give(np.empty(100, dtype=np.uint8))
+    pool.give(np.empty(80, dtype=np.uint8))
+    pool.give(np.empty(60, dtype=np.uint8))
+
+    state = pool.snapshot()
+    assert state["pooled_bytes"] == 140
+    assert state["evictions"] == 1
+    assert pool.take((100,), np.uint8) is not None
+    assert pool.snapshot()["misses"] == 1
+
+
+def test_buffer_pool_ignores_views_and_oversized_arrays():
+    pool = BufferPool(max_bytes=64)
+
+    base = np.empty(32, dtype=np.uint8)
+    pool.give(base[:16])
+    pool.give(np.empty(128, dtype=np.uint8))
+
+    assert pool.snapshot()["pooled_arrays"] == 0
+
+    pool.configure(0)
+    pool.give(base)
+    assert pool.snapshot()["pooled_arrays"] == 0
@@ -1,3 +1,5 @@
+from pydantic import ValidationError
+
 from app.core.config import Settings
 
 
@@ -9,3 +11,14 @@ def test_env_overrides(monkeypatch):
 
     assert settings.default_num_colors == 15
     assert settings.max_upload_bytes == 5 * 1024 * 1024
+
+
+def test_outline_line_width_must_be_positive(monkeypatch):
+    monkeypatch.setenv("PBN_OUTLINE_LINE_WIDTH", "0")
+
+    try:
+        Settings()
+    except ValidationError as exc:
+        assert "outline_line_width" in str(exc)
+    else:
+        assert False, "Expected ValidationError"
@@ -1,9 +1,14 @@
 import base64
+import hashlib
 import io
+import json
 
+import numpy as np
 from fastapi.testclient import TestClient
 from PIL import Image
 
+from app.api.generate import _encode_png
+from app.core.config import settings
 from app.main import app
 
 
@@ -36,19 +41,22 @@ def test_generate_endpoint_returns_assets():
     assert payload["image"]["content_type"] == "image/png"
     png_data = base64.b64decode(payload["image"]["data"])
     assert png_data.startswith(b"\x89PNG")
+    assert Image.open(io.BytesIO(png_data)).mode == "L"  # the page only holds grays
     assert payload["preview"]["content_type"] == "image/png"
     preview_data = base64.b64decode(payload["preview"]["data"])
     assert preview_data.startswith(b"\x89PNG")
+    assert Image.open(io.BytesIO(preview_data)).mode == "RGB"
     assert payload["legend"]["content_type"] == "application/pdf"
     pdf_data = base64.b64decode(payload["legend"]["data"])
     assert pdf_data.startswith(b"%PDF")
     assert len(payload["palette"]) == 3
+    assert payload["meta"]["components"]["quantized"] >= 3
 
 
 def test_generate_endpoint_rejects_bad_mime():
     response = client.post(
         "/generate/",
-        data={"num_colors": "3", "max_width": "100"},
+        data={"num_colors": "3", "max_width": "800"},
         files={"file": ("test.txt", b"abc", "text/plain")},
     )
 
@@ -56,6 +64,28 @@ def test_generate_endpoint_rejects_bad_mime():
     assert "Unsupported file type" in response.text
 
 
+def test_generate_endpoint_sniffs_upload_instead_of_content_type(monkeypatch):
+    upload = _make_upload().getvalue()
+    response = client.post(
+        "/generate/",
+        data={"num_colors": "3", "max_width": "800", "outputs": "preview"},
+        files={"file": ("upload.bin", upload, "application/octet-stream")},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["meta"]["content_hash"] == hashlib.sha256(upload).hexdigest()
+
+    monkeypatch.setattr(settings, "max_input_pixels", 15)
+    response = client.post(
+        "/generate/",
+        data={"num_colors": "3", "max_width": "800", "outputs": "preview"},
+        files={"file": ("test.png", upload, "image/png")},
+    )
+
+    assert response.status_code == 400
+    assert "at most 15 pixels" in response.text
+
+
 def test_generate_endpoint_rejects_invalid_ranges():
     buffer = _make_upload()
     files = {"file": ("test.png", buffer, "image/png")}
@@ -74,3 +104,240 @@ def test_generate_endpoint_rejects_invalid_ranges():
         files={"file": ("test.png", buffer, "image/png")},
     )
     assert response.status_code == 400
+
+
+def test_editable_result_accepts_region_edits():
+    image = Image.new("RGB", (400, 200), (255, 0, 0))
+    image.paste((0, 0, 255), (200, 0, 400, 200))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    buffer.seek(0)
+
+    response = client.post(
+        "/generate/",
+        data={"num_colors": "3", "max_width": "400", "editable": "true"},
+        files={"file": ("test.png", buffer, "image/png")},
+    )
+    assert response.status_code == 200
+    result_id = response.json()["result_id"]
+
+    response = client.post(
+        f"/results/{result_id}/edits",
+        json={"op": "merge", "x": 10, "y": 10, "into_x": 390, "into_y": 10},
+    )
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["meta"]["regions"] == 1
+    assert payload["preview"]["width"] == 200
+    assert base64.b64decode(payload["image"]["data"]).startswith(b"\x89PNG")
+
+    response = client.post(f"/results/{result_id}/edits", json={"op": "recolor", "x": 1, "y": 1})
+    assert response.status_code == 400
+
+    response = client.post("/results/missing/edits", json={"op": "recolor", "x": 1, "y": 1})
+    assert response.status_code == 404
+
+
+def test_generate_endpoint_returns_requested_outputs_only():
+    response = client.post(
+        "/generate/",
+        data={"num_colors": "3", "max_width": "800", "outputs": "preview"},
+        files={"file": ("test.png", _make_upload(), "image/png")},
+    )
+    assert response.status_code == 200
+    payload = response.json()
+    assert "preview" in payload
+    assert "image" not in payload
+    assert "legend" not in payload
+    assert len(payload["palette"]) == 3
+
+    response = client.post(
+        "/generate/",
+        data={"num_colors": "3", "max_width": "800", "outputs": "preview,thumbnail"},
+        files={"file": ("test.png", _make_upload(), "image/png")},
+    )
+    assert response.status_code == 400
+
+
+def test_generate_endpoint_region_budget_reports_threshold():
+    response = client.post(
+        "/generate/",
+        data={"num_colors": "3", "max_width": "800", "max_regions": "2", "outputs": "preview"},
+        files={"file": ("test.png", _make_upload(), "image/png")},
+    )
+
+    assert response.status_code == 200
+    meta = response.json()["meta"]
+    assert meta["regions"] <= 2
+    assert meta["min_region_size"] > 1
+
+
+def test_generate_endpoint_region_budget_holds_on_noisy_photo():
+    rng = np.random.default_rng(11)
+    image = Image.fromarray(rng.integers(0, 256, size=(60, 80, 3), dtype=np.uint8), mode="RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    buffer.seek(0)
+
+    response = client.post(
+        "/generate/",
+        data={"num_colors": "6", "max_width": "400", "max_regions": "10", "outputs": "preview"},
+        files={"file": ("noise.png", buffer, "image/png")},
+    )
+
+    assert response.status_code == 200
+    meta = response.json()["meta"]
+    assert meta["components"]["quantized"] > 10
+    assert meta["regions"] <= 10
+
+
+def test_ops_admission_reports_client_usage(monkeypatch):
+    monkeypatch.setattr(settings, "ops_token", "secret")
+    assert client.get("/ops/admission").status_code == 403
+
+    response = client.post(
+        "/generate/",
+        data={"num_colors": "3", "max_width": "800", "outputs": "preview"},
+        files={"file": ("test.png", _make_upload(), "image/png")},
+        headers={"X-Client-Id": "spoofed"},
+    )
+    assert response.status_code == 200
+    monkeypatch.setattr(settings, "admission_trusted_proxies", ["testclient"])
+    response = client.post(
+        "/generate/",
+        data={"num_colors": "3", "max_width": "800", "outputs": "preview"},
+        files={"file": ("test.png", _make_upload(), "image/png")},
+        headers={"X-Client-Id": "proxied"},
+    )
+    assert response.status_code == 200
+
+    state = client.get("/ops/admission", headers={"X-Ops-Token": "secret"}).json()
+
+    assert state["running"] == 0
+    assert "spoofed" not in state["clients"]
+    assert state["clients"]["testclient"]["completed"] >= 1
+    assert state["clients"]["proxied"]["completed"] == 1
+
+
+def test_ready_reports_latency_and_saturation(monkeypatch):
+    response = client.post(
+        "/generate/",
+        data={"num_colors": "3", "max_width": "800", "outputs": "preview"},
+        files={"file": ("test.png", _make_upload(), "image/png")},
+    )
+    assert response.status_code == 200
+
+    response = client.get("/ready")
+    assert response.status_code == 200
+    state = response.json()
+    assert state["status"] == "ready"
+    assert state["in_flight"] == 0
+    assert state["latency_s"]["samples"] >= 1
+    assert state["latency_s"]["p95"] >= state["latency_s"]["p50"] > 0
+
+    monkeypatch.setattr(settings, "ready_max_rss_mb", 1.0)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["reasons"] == ["memory"]
+
+
+def test_ops_routes_hidden_without_token():
+    assert client.get("/ops/admission").status_code == 404
+
+
+def test_generate_endpoint_profiles_on_request(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "profiling_enabled", True)
+    monkeypatch.setattr(settings, "profiling_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "ops_token", "secret")
+
+    def post(headers):
+        return client.post(
+            "/generate/",
+            data={"num_colors": "3", "max_width": "800"},
+            files={"file": ("test.png", _make_upload(), "image/png")},
+            headers=headers,
+        )
+
+    assert "profile_id" not in post({"X-Profile": "1"}).json()["meta"]
+
+    response = post({"X-Profile": "1", "X-Ops-Token": "secret"})
+
+    assert response.status_code == 200
+    profile_id = response.json()["meta"]["profile_id"]
+    request = json.loads((tmp_path / profile_id / "request.json").read_text())
+    assert request["params"]["num_colors"] == 3
+    assert (tmp_path / profile_id / "input.bin").read_bytes() == _make_upload().getvalue()
+
+
+def test_generate_endpoint_inventory_mode_returns_paint_names():
+    response = client.post(
+        "/generate/",
+        data={
+            "max_width": "800",
+            "palette_mode": "inventory",
+            "paints": "PBN-001,PBN-014,PBN-033,PBN-044",
+            "outputs": "legend",
+        },
+        files={"file": ("test.png", _make_upload(), "image/png")},
+    )
+
+    assert response.status_code == 200
+    palette = response.json()["palette"]
+    assert {entry["code"] for entry in palette} <= {"PBN-001", "PBN-014", "PBN-033", "PBN-044"}
+    assert all(entry["name"] for entry in palette)
+
+
+def test_generate_endpoint_rejects_bad_paint_requests():
+    for data in (
+        {"palette_mode": "crayons"},
+        {"palette_mode": "inventory", "paints": "PBN-001"},
+        {"palette_mode": "snap", "paints": "PBN-001,NOPE"},
+    ):
+        response = client.post(
+            "/generate/",
+            data={"num_colors": "3", "max_width": "800", **data},
+            files={"file": ("test.png", _make_upload(), "image/png")},
+        )
+
+        assert response.status_code == 400
+
+
+def test_generate_endpoint_superpixel_segmentation():
+    data = {"num_colors": "3", "max_width": "800", "outputs": "preview"}
+    files = {"file": ("test.png", _make_upload(), "image/png")}
+
+    response = client.post("/generate/", data={**data, "segmentation": "superpixels"}, files=files)
+
+    assert response.status_code == 200
+    assert response.json()["preview"]["width"] == 4
+
+    files = {"file": ("test.png", _make_upload(), "image/png")}
+    response = client.post("/generate/", data={**data, "segmentation": "blobs"}, files=files)
+
+    assert response.status_code == 400
+
+
+def test_generate_endpoint_lab_color_space():
+    data = {"num_colors": "3", "max_width": "800", "outputs": "preview"}
+    files = {"file": ("test.png", _make_upload(), "image/png")}
+
+    response = client.post("/generate/", data={**data, "color_space": "lab"}, files=files)
+
+    assert response.status_code == 200
+    assert len(response.json()["palette"]) == 3
+
+    files = {"file": ("test.png", _make_upload(), "image/png")}
+    response = client.post("/generate/", data={**data, "color_space": "hsv"}, files=files)
+
+    assert response.status_code == 400
+
+
+def test_encode_png_reuses_buffer_without_stale_bytes():
+    large = Image.effect_noise((64, 64), 50).convert("RGB")
+    small = Image.new("RGB", (2, 2), (10, 20, 30))
+
+    _encode_png(large)
+    decoded = Image.open(io.BytesIO(base64.b64decode(_encode_png(small))))
+
+    assert decoded.size == (2, 2)
+    assert decoded.getpixel((1, 1)) == (10, 20, 30)
@@ -0,0 +1,75 @@
+import hashlib
+import io
+import struct
+
+from PIL import Image
+
+from app.services.ingest import ImageHeader, UploadIngest, sniff_image
+
+
+def _encode(image: Image.Image, fmt: str, **params) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **params)
+    return buffer.getvalue()
+
+
+def _png_header(width: int, height: int) -> bytes:
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(ihdr)) + b"IHDR" + ihdr
+
+
+def test_sniff_image_reads_png_and_jpeg_sizes():
+    image = Image.new("RGB", (37, 21), (200, 10, 10))
+    exif = Image.Exif()
+    exif[0x010E] = "x" * 5000  # a large APP1 segment ahead of the frame header
+    jpeg = _encode(image, "JPEG", exif=exif)
+
+    assert sniff_image(_encode(image, "PNG")) == ImageHeader("PNG", 37, 21)
+    assert sniff_image(jpeg) == ImageHeader("JPEG", 37, 21)
+    assert sniff_image(jpeg[:200]) is None
+    assert sniff_image(b"\x89PN") is None
+
+
+def test_sniff_image_rejects_other_formats():
+    for data in (b"GIF89a....", b"hello", _encode(Image.new("RGB", (4, 4)), "BMP")):
+        try:
+            sniff_image(data)
+        except ValueError as exc:
+            assert "Unsupported file type" in str(exc)
+        else:
+            assert False, "Expected ValueError"
+
+
+def test_upload_ingest_hashes_and_sniffs_across_chunks():
+    data = _encode(Image.new("RGB", (30, 40), (1, 2, 3)), "PNG")
+    ingest = UploadIngest(max_bytes=len(data), max_pixels=30 * 40)
+
+    for start in range(0, len(data), 5):
+        ingest.feed(data[start : start + 5])
+
+    assert ingest.finish() == ImageHeader("PNG", 30, 40)
+    assert ingest.sha256 == hashlib.sha256(data).hexdigest()
+    assert ingest.size == len(data)
+
+
+def test_upload_ingest_rejects_early():
+    cases = [
+        (10, b"x" * 11, "File too large"),
+        (100, b"%PDF-1.4", "Unsupported file type"),
+        (100, _png_header(50000, 50000), "at most 1000000 pixels"),
+        (100, _png_header(0, 10), "Invalid image file"),
+    ]
+    for max_bytes, first_chunk, message in cases:
+        try:
+            UploadIngest(max_bytes=max_bytes, max_pixels=10**6).feed(first_chunk)
+        except ValueError as exc:
+            assert message in str(exc)
+        else:
+            assert False, "Expected ValueError"
+
+    try:
+        UploadIngest(max_bytes=100, max_pixels=10**6).finish()
+    except ValueError as exc:
+        assert "File is empty" in str(exc)
+    else:
+        assert False, "Expected ValueError"
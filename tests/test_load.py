@@ -0,0 +1,57 @@
+from app.core.config import settings
+from app.services.admission import AdmissionController
+from app.services.load import LoadTracker, _percentile, current_rss_mb
+
+
+def _controller(max_concurrent_jobs=1):
+    return AdmissionController(
+        max_concurrent_jobs=max_concurrent_jobs,
+        max_queued=10,
+        client_max_concurrent=1,
+        client_max_cost=100.0,
+        client_max_queued=10,
+        cost_per_second=2.0,
+    )
+
+
+def test_percentile_uses_nearest_rank():
+    ordered = [float(value) for value in range(1, 21)]
+
+    assert _percentile(ordered, 0.5) == 10.0
+    assert _percentile(ordered, 0.95) == 19.0
+    assert _percentile([3.0], 0.95) == 3.0
+
+
+def test_load_tracker_reports_ready_then_saturated(monkeypatch):
+    controller = _controller(max_concurrent_jobs=2)
+    tracker = LoadTracker(controller, window=3)
+
+    state = tracker.snapshot()
+    assert state["status"] == "ready"
+    assert state["latency_s"] == {"p50": None, "p95": None, "samples": 0}
+
+    for seconds in (9.0, 1.0, 2.0, 3.0):
+        tracker.record(seconds)
+    controller.running = 1
+    state = tracker.snapshot()
+    assert state["status"] == "ready"
+    assert state["in_flight"] == 1
+    assert state["latency_s"] == {"p50": 2.0, "p95": 3.0, "samples": 3}
+
+    controller.running = 2
+    monkeypatch.setattr(settings, "ready_max_p95_seconds", 2.5)
+    state = tracker.snapshot()
+    assert state["status"] == "saturated"
+    assert state["reasons"] == ["in_flight", "latency"]
+
+
+def test_load_tracker_memory_threshold(monkeypatch):
+    tracker = LoadTracker(_controller(), window=10)
+    monkeypatch.setattr(settings, "ready_max_rss_mb", 1.0)
+
+    state = tracker.snapshot()
+
+    if current_rss_mb() is None:
+        assert state["rss_mb"] is None
+    else:
+        assert state["reasons"] == ["memory"]
@@ -1,7 +1,15 @@
 import numpy as np
 from PIL import Image
 
-from app.services.image_pipeline.numbering import add_numbers
+from app.services.image_pipeline.fonts import load_font
+from app.services.image_pipeline.numbering import (
+    add_numbers,
+    layout_numbers,
+    number_font_size,
+    number_half_extent,
+    render_numbered_outline,
+)
+from app.services.image_pipeline.outline import make_outline_image
 
 
 def test_add_numbers_draws_text_for_each_cluster():
@@ -33,3 +41,59 @@ def test_add_numbers_handles_empty_clusters():
     result = add_numbers(outline, labels, palette)
 
     assert isinstance(result, Image.Image)
+
+
+def test_render_numbered_outline_matches_separate_stages():
+    labels = np.zeros((60, 80), dtype=int)
+    labels[:, 40:] = 1
+    labels[30:, :20] = 2
+    palette = np.array([[255, 0, 0], [0, 255, 0], [0, 0, 255]], dtype=np.uint8)
+
+    fused = render_numbered_outline(labels)
+    separate = add_numbers(make_outline_image(labels), labels, palette)
+
+    assert fused.mode == "RGB"
+    assert np.array_equal(np.array(fused), np.array(separate))
+
+
+def test_render_numbered_outline_grayscale_mode():
+    labels = np.zeros((60, 80), dtype=int)
+    labels[:, 40:] = 1
+
+    rgb = render_numbered_outline(labels)
+    gray = render_numbered_outline(labels, mode="L")
+
+    assert gray.mode == "L"
+    assert np.array_equal(np.array(gray), np.array(rgb)[:, :, 0])
+
+
+def _snake_labels():
+    labels = np.zeros((240, 400), dtype=int)
+    labels[20:60, 20:380] = 1  # a long band snaking back
+    labels[60:160, 340:380] = 1
+    labels[160:200, 20:380] = 1
+    labels[220:240, :] = 2
+    return labels
+
+
+def test_layout_numbers_places_one_number_per_region_by_default():
+    layout = layout_numbers(_snake_labels())
+
+    assert [len(points) for points in layout.anchors] == [1, 1, 1]
+
+
+def test_layout_numbers_repeats_numbers_in_large_regions_without_overlap():
+    labels = _snake_labels()
+    layout = layout_numbers(labels, spacing=60)
+
+    half_h, half_w = number_half_extent(load_font(number_font_size(labels.shape[1])), 3)
+    snake = [region.label for region in layout.regions].index(1)
+    assert len(layout.anchors[snake]) >= 4
+    for y, x in layout.anchors[snake][1:]:  # the first is the usual single anchor
+        box = labels[y - half_h - 1 : y + half_h + 2, x - half_w - 1 : x + half_w + 2]
+        assert np.all(box == 1)
+
+    points = [point for anchors in layout.anchors for point in anchors]
+    for index, (y, x) in enumerate(points):
+        for other_y, other_x in points[index + 1 :]:
+            assert abs(other_y - y) > 2 * half_h or abs(other_x - x) > 2 * half_w
@@ -1,6 +1,6 @@
 import numpy as np
 
-from app.services.image_pipeline.outline import make_outline_image
+from app.services.image_pipeline.outline import compute_borders, make_outline_image
 
 
 def test_uniform_labels_produce_white_image():
@@ -36,3 +36,25 @@ def test_outline_detects_simple_boundary():
     )
 
     assert np.array_equal(result, expected)
+
+
+def test_compute_borders_dilates_with_line_width():
+    labels = np.zeros((7, 7), dtype=int)
+    labels[:, 4:] = 1
+
+    thin = compute_borders(labels)
+    thick = compute_borders(labels, line_width=2)
+
+    assert thin[:, 3:5].all()
+    assert not thin[:, :3].any() and not thin[:, 5:].any()
+    assert thick[:, 2:6].all()
+    assert not thick[:, :2].any() and not thick[:, 6:].any()
+
+
+def test_compute_borders_rejects_invalid_line_width():
+    try:
+        compute_borders(np.zeros((2, 2), dtype=int), line_width=0)
+    except ValueError as exc:
+        assert "line_width" in str(exc)
+    else:
+        assert False, "Expected ValueError"
@@ -0,0 +1,80 @@
+import json
+
+import numpy as np
+
+from app.services.image_pipeline.colorspace import lab_to_rgb, rgb_to_lab, rgb_to_lab_lut
+from app.services.image_pipeline.paints import Paint, PaintInventory, load_paint_inventory
+
+
+def make_inventory() -> PaintInventory:
+    return PaintInventory(
+        [
+            Paint("W", "White", (255, 255, 255)),
+            Paint("K", "Black", (0, 0, 0)),
+            Paint("R", "Red", (220, 20, 30)),
+            Paint("B", "Blue", (20, 40, 200)),
+        ]
+    )
+
+
+def test_rgb_to_lab_matches_reference_values():
+    lab = rgb_to_lab(np.array([[255, 255, 255], [0, 0, 0], [255, 0, 0]], dtype=np.uint8))
+
+    assert np.allclose(lab[0], [100, 0, 0], atol=0.01)
+    assert np.allclose(lab[1], [0, 0, 0], atol=0.01)
+    assert np.allclose(lab[2], [53.24, 80.09, 67.20], atol=0.05)
+
+
+def test_rgb_to_lab_lut_stays_close_to_exact_conversion():
+    rgb = np.random.default_rng(0).integers(0, 256, size=(5000, 3), dtype=np.uint8)
+
+    error = np.linalg.norm(rgb_to_lab_lut(rgb) - rgb_to_lab(rgb), axis=-1)
+
+    assert rgb_to_lab_lut(rgb.reshape(50, 100, 3)).shape == (50, 100, 3)
+    assert error.mean() < 1.5
+    assert error.max() < 3.5
+
+
+def test_lab_to_rgb_round_trips_8_bit_colors():
+    rgb = np.random.default_rng(1).integers(0, 256, size=(5000, 3), dtype=np.uint8)
+
+    assert np.array_equal(lab_to_rgb(rgb_to_lab(rgb)), rgb)
+    assert np.array_equal(lab_to_rgb([[200, 0, 0]]), [[255, 255, 255]])
+
+
+def test_nearest_returns_closest_paint():
+    inventory = make_inventory()
+
+    indices = inventory.nearest(np.array([[250, 250, 245], [10, 5, 0], [200, 0, 0], [0, 0, 150]]))
+
+    assert indices.tolist() == [0, 1, 2, 3]
+
+
+def test_subset_keeps_order_and_rejects_unknown_codes():
+    inventory = make_inventory()
+
+    subset = inventory.subset(["B", "W", "B"])
+
+    assert [paint.code for paint in subset.paints] == ["B", "W"]
+    try:
+        inventory.subset(["W", "nope"])
+    except ValueError as exc:
+        assert "nope" in str(exc)
+    else:
+        assert False, "Expected ValueError"
+
+
+def test_load_paint_inventory_reads_json(tmp_path):
+    path = tmp_path / "paints.json"
+    path.write_text(json.dumps([{"code": "X1", "name": "Teal", "hex": "#1E6F6A"}]))
+
+    inventory = load_paint_inventory(str(path))
+
+    assert inventory.paints == (Paint("X1", "Teal", (30, 111, 106)),)
+
+
+def test_bundled_inventory_loads():
+    inventory = load_paint_inventory()
+
+    assert len(inventory) > 50
+    assert len({paint.code for paint in inventory.paints}) == len(inventory)
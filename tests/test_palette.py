@@ -1,5 +1,6 @@
 import numpy as np
 
+from app.services.image_pipeline.paints import Paint
 from app.services.image_pipeline.palette import (
     build_palette_metadata,
     render_palette_pdf,
@@ -45,3 +46,20 @@ def test_render_painted_preview_matches_palette():
 
     assert tuple(pixels[0, 0]) == (255, 0, 0)
     assert tuple(pixels[0, 1]) == (0, 0, 255)
+
+
+def test_build_palette_metadata_adds_paint_names():
+    palette = np.array([[255, 255, 255]], dtype=np.uint8)
+
+    metadata = build_palette_metadata(palette, [Paint("PBN-001", "Titanium White", (255,) * 3)])
+
+    assert metadata == [
+        {
+            "number": 1,
+            "rgb": (255, 255, 255),
+            "hex": "#FFFFFF",
+            "name": "Titanium White",
+            "code": "PBN-001",
+        }
+    ]
+    assert render_palette_pdf(metadata).startswith(b"%PDF")
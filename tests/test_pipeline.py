@@ -0,0 +1,145 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from app.services.image_pipeline.paints import Paint, PaintInventory
+from app.services.image_pipeline.pipeline import Stage, run_pipeline, run_stages
+from app.services.image_pipeline.regions import find_regions
+
+
+def _make_image() -> io.BytesIO:
+    image = Image.new("RGB", (40, 20), (255, 0, 0))
+    image.paste((0, 0, 255), (20, 0, 40, 20))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    buffer.seek(0)
+    return buffer
+
+
+def test_run_stages_only_runs_required_stages():
+    calls = []
+
+    def record(name, value):
+        def func(*args):
+            calls.append(name)
+            return value + sum(args)
+
+        return func
+
+    stages = [
+        Stage("a", record("a", 1)),
+        Stage("b", record("b", 10), ("a",)),
+        Stage("c", record("c", 100), ("a",)),
+        Stage("d", record("d", 1000), ("b", "c")),
+    ]
+
+    results = run_stages(stages, ["b"])
+    assert results == {"a": 1, "b": 11}
+    assert calls == ["a", "b"]
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = run_stages(stages, ["d"], executor)
+    assert results["d"] == 1000 + 11 + 101
+
+
+def test_run_pipeline_skips_unrequested_outputs():
+    result = run_pipeline(_make_image(), num_colors=2, max_width=40, outputs=["legend"])
+
+    assert result.image is None
+    assert result.preview is None
+    assert result.legend.startswith(b"%PDF")
+    assert len(result.palette_metadata) == 2
+    assert result.label_img.shape == (20, 40)
+
+
+def test_run_pipeline_renders_all_outputs_concurrently():
+    result = run_pipeline(_make_image(), num_colors=2, max_width=40)
+
+    assert result.image.size == (40, 20)
+    assert result.preview.size == (40, 20)
+    assert result.legend.startswith(b"%PDF")
+
+
+def test_run_pipeline_tunes_min_region_size_for_region_budget():
+    image = Image.new("RGB", (40, 20), (255, 0, 0))
+    image.paste((0, 0, 255), (20, 0, 40, 20))
+    image.paste((0, 255, 0), (5, 5, 8, 8))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    buffer.seek(0)
+
+    result = run_pipeline(buffer, num_colors=3, max_width=40, max_regions=2, outputs=["preview"])
+
+    assert result.min_region_size == 10
+    assert result.region_stats.components == 3
+    assert result.region_stats.merged == 1
+    assert result.region_stats.regions == 2
+
+
+def test_run_pipeline_region_budget_holds_on_fragmented_image():
+    rng = np.random.default_rng(3)
+    image = Image.fromarray(rng.integers(0, 256, size=(30, 40, 3), dtype=np.uint8), mode="RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    buffer.seek(0)
+
+    result = run_pipeline(buffer, num_colors=6, max_width=40, max_regions=5, outputs=["preview"])
+
+    assert result.region_stats.components > 5
+    assert result.region_stats.regions <= 5
+    assert len(find_regions(result.label_img)) == result.region_stats.regions
+
+
+def test_run_pipeline_exposes_page_layout_only_with_image():
+    with_image = run_pipeline(_make_image(), num_colors=2, max_width=40, outputs=["image"])
+    without = run_pipeline(_make_image(), num_colors=2, max_width=40, outputs=["preview"])
+
+    assert len(with_image.layout.regions) == 2
+    assert without.layout is None
+
+
+def test_run_pipeline_paint_modes_report_paints():
+    inventory = PaintInventory(
+        [
+            Paint("R", "Red", (230, 10, 10)),
+            Paint("W", "White", (255, 255, 255)),
+            Paint("B", "Blue", (10, 10, 230)),
+        ]
+    )
+
+    for palette_mode in ("snap", "inventory"):
+        result = run_pipeline(
+            _make_image(),
+            num_colors=2,
+            max_width=40,
+            palette_mode=palette_mode,
+            inventory=inventory,
+            outputs=["preview"],
+        )
+
+        assert [entry["code"] for entry in result.palette_metadata] == ["R", "B"]
+        assert result.preview.getpixel((0, 0)) == (230, 10, 10)
+
+    try:
+        run_pipeline(_make_image(), num_colors=2, max_width=40, palette_mode="snap")
+    except ValueError as exc:
+        assert "inventory" in str(exc)
+    else:
+        assert False, "Expected ValueError"
+
+
+def test_run_pipeline_superpixel_segmentation():
+    result = run_pipeline(
+        _make_image(),
+        num_colors=2,
+        max_width=40,
+        segmentation="superpixels",
+        superpixel_size=5,
+        outputs=["preview"],
+    )
+
+    assert result.label_img.shape == (20, 40)
+    assert result.preview.getpixel((0, 0)) == (255, 0, 0)
+    assert result.preview.getpixel((39, 19)) == (0, 0, 255)
@@ -0,0 +1,23 @@
+import numpy as np
+from PIL import Image
+
+from app.services.image_pipeline.prefilter import prefilter_image
+
+
+def test_prefilter_removes_isolated_pixels_and_keeps_edges():
+    array = np.zeros((20, 20, 3), dtype=np.uint8)
+    array[:, 10:] = 255
+    array[5, 3] = 255  # speck in the dark half
+    image = Image.fromarray(array, mode="RGB")
+
+    result = np.array(prefilter_image(image, strength=1))
+
+    assert np.all(result[5, 3] == 0)
+    assert np.all(result[:, :10] == 0)
+    assert np.all(result[:, 10:] == 255)
+
+
+def test_prefilter_strength_zero_is_a_no_op():
+    image = Image.new("RGB", (4, 4), (1, 2, 3))
+
+    assert prefilter_image(image, strength=0) is image
@@ -0,0 +1,78 @@
+import json
+import os
+import pstats
+import threading
+
+from app.core.config import settings
+from app.services.profiling import (
+    INPUT_FILE,
+    PROFILE_FILE,
+    REQUEST_FILE,
+    enforce_disk_cap,
+    profile_request,
+    should_profile,
+)
+
+
+def test_profile_request_writes_capture(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "profiling_dir", str(tmp_path))
+
+    with profile_request(True, params={"num_colors": 3}, source=b"abc") as capture:
+        sum(range(1000))
+
+    assert capture is not None
+    assert capture.directory.parent == tmp_path
+    assert (capture.directory / INPUT_FILE).read_bytes() == b"abc"
+    request = json.loads((capture.directory / REQUEST_FILE).read_text())
+    assert request["params"] == {"num_colors": 3}
+    assert request["sha256"] == capture.sha256
+    assert pstats.Stats(str(capture.directory / PROFILE_FILE)).total_calls > 0
+
+
+def test_profile_request_skips_when_disabled_or_busy(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "profiling_dir", str(tmp_path))
+
+    with profile_request(False, params={}, source=b"") as capture:
+        assert capture is None
+
+    inner_captures = []
+
+    def nested():
+        with profile_request(True, params={}, source=b"") as inner:
+            inner_captures.append(inner)
+
+    with profile_request(True, params={}, source=b"") as outer:
+        thread = threading.Thread(target=nested)
+        thread.start()
+        thread.join()
+
+    assert outer is not None
+    assert inner_captures == [None]
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_enforce_disk_cap_removes_oldest_captures(tmp_path):
+    for index in range(3):
+        capture = tmp_path / f"capture-{index}"
+        capture.mkdir()
+        (capture / REQUEST_FILE).write_text("{}")
+        (capture / INPUT_FILE).write_bytes(b"x" * 100)
+        os.utime(capture, (index, index))
+
+    removed = enforce_disk_cap(tmp_path, 250)
+
+    assert removed == [tmp_path / "capture-0"]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["capture-1", "capture-2"]
+
+
+def test_should_profile_honours_enabled_flag_and_rate(monkeypatch):
+    monkeypatch.setattr(settings, "profiling_enabled", False)
+    assert not should_profile(True)
+
+    monkeypatch.setattr(settings, "profiling_enabled", True)
+    monkeypatch.setattr(settings, "profiling_sample_rate", 0.0)
+    assert should_profile(True)
+    assert not should_profile(False)
+
+    monkeypatch.setattr(settings, "profiling_sample_rate", 1.0)
+    assert should_profile(False)
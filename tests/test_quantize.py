@@ -1,7 +1,13 @@
 import numpy as np
 from PIL import Image
 
-from app.services.image_pipeline.quantize import quantize_colors
+from app.services.image_pipeline.paints import Paint, PaintInventory
+from app.services.image_pipeline.quantize import (
+    assign_paints,
+    quantize_colors,
+    quantize_superpixels,
+    snap_to_paints,
+)
 
 
 def make_test_image() -> Image.Image:
@@ -37,3 +43,72 @@ def test_quantize_colors_raises_for_invalid_k():
         assert "num_colors" in str(exc)
     else:
         assert False, "Expected ValueError"
+
+
+def test_quantize_colors_in_lab_returns_srgb_palette():
+    img = make_test_image()
+
+    labels, palette = quantize_colors(img, num_colors=3, color_space="lab")
+
+    assert palette.dtype == np.uint8
+    assert labels[0, 0] == labels[0, 1]
+    assert len(np.unique(labels)) == 3
+    # Each pure primary is reproduced to within the lookup table's bin error.
+    for (y, x), color in (((0, 0), (255, 0, 0)), ((1, 0), (0, 255, 0)), ((1, 1), (0, 0, 255))):
+        assert np.abs(palette[labels[y, x]].astype(int) - color).max() <= 8
+
+    try:
+        quantize_colors(img, num_colors=3, color_space="hsv")
+    except ValueError as exc:
+        assert "color_space" in str(exc)
+    else:
+        assert False, "Expected ValueError"
+
+
+def test_snap_to_paints_merges_clusters_on_the_same_paint():
+    inventory = PaintInventory(
+        [Paint("W", "White", (255, 255, 255)), Paint("R", "Red", (220, 20, 30))]
+    )
+    labels = np.array([[0, 1], [2, 2]])
+    palette = np.array([[250, 250, 250], [240, 240, 235], [200, 30, 30]], dtype=np.uint8)
+
+    snapped, snapped_palette, paints = snap_to_paints(labels, palette, inventory)
+
+    assert snapped.tolist() == [[0, 0], [1, 1]]
+    assert snapped_palette.tolist() == [[255, 255, 255], [220, 20, 30]]
+    assert [paint.code for paint in paints] == ["W", "R"]
+
+
+def test_assign_paints_labels_pixels_without_fitting():
+    inventory = PaintInventory(
+        [
+            Paint("G", "Green", (0, 200, 0)),
+            Paint("R", "Red", (220, 20, 30)),
+            Paint("B", "Blue", (20, 40, 200)),
+        ]
+    )
+
+    labels, palette, paints = assign_paints(make_test_image(), inventory)
+
+    assert labels.tolist() == [[1, 1], [0, 2]]
+    assert palette.tolist() == [[0, 200, 0], [220, 20, 30], [20, 40, 200]]
+    assert [paint.code for paint in paints] == ["G", "R", "B"]
+
+
+def test_quantize_superpixels_colors_whole_superpixels():
+    img = Image.new("RGB", (40, 40), (240, 240, 240))
+    img.paste((20, 20, 200), (0, 0, 20, 40))
+    noisy = np.asarray(img).astype(int)
+    noisy[::3, ::3] += 8
+    img = Image.fromarray(np.clip(noisy, 0, 255).astype(np.uint8))
+
+    labels, palette = quantize_superpixels(img, num_colors=2, step=10)
+
+    assert labels.shape == (40, 40)
+    assert palette.shape == (2, 3)
+    assert len(np.unique(labels[:, :20])) == 1
+    assert len(np.unique(labels[:, 20:])) == 1
+    assert labels[0, 0] != labels[0, 39]
+
+    lab_labels, _ = quantize_superpixels(img, num_colors=2, step=10, color_space="lab")
+    assert np.array_equal(lab_labels == lab_labels[0, 0], labels == labels[0, 0])
@@ -0,0 +1,131 @@
+import numpy as np
+
+from app.services.image_pipeline.numbering import layout_numbers, render_numbered_outline
+from app.services.image_pipeline.palette import render_painted_preview
+from app.services.image_pipeline.region_model import (
+    build_region_model,
+    merge_regions,
+    recolor_region,
+    render_page_window,
+    render_preview_window,
+)
+
+
+def _labels():
+    labels = np.zeros((60, 90), dtype=int)
+    labels[:, 30:60] = 1
+    labels[:, 60:] = 2
+    labels[20:40, 5:20] = 2
+    return labels
+
+
+PALETTE = np.array([[255, 0, 0], [0, 255, 0], [0, 0, 255]], dtype=np.uint8)
+
+
+def _model(labels=None):
+    labels = _labels() if labels is None else labels
+    page = render_numbered_outline(labels, mode="L")
+    preview = render_painted_preview(labels, PALETTE)
+    return build_region_model(labels, PALETTE, page, preview)
+
+
+def _full_render(model):
+    height, width = model.components.shape
+    page, preview = model.page.copy(), model.preview.copy()
+    render_page_window(model, (0, 0, height, width))
+    render_preview_window(model, (0, 0, height, width))
+    full = np.array(model.page), np.array(model.preview)
+    model.page, model.preview = page, preview
+    return full
+
+
+def test_build_region_model_tracks_components_and_adjacency():
+    model = _model()
+
+    assert model.region_count == 4
+    island = model.component_at(10, 30)
+    left = model.component_at(0, 0)
+    assert model.adjacency[island] == {left}
+    assert model.colors[island] == 2
+
+
+def test_build_region_model_reuses_page_layout():
+    labels = _labels()
+    layout = layout_numbers(labels)
+    page = render_numbered_outline(labels, mode="L", layout=layout)
+    preview = render_painted_preview(labels, PALETTE)
+
+    shared = build_region_model(labels, PALETTE, page, preview, layout=layout)
+    fresh = _model(labels)
+
+    assert np.array_equal(np.array(page), np.array(fresh.page))
+    assert np.array_equal(shared.components, fresh.components)
+    assert np.array_equal(shared.anchors, fresh.anchors)
+
+
+def test_window_render_reproduces_original_page():
+    model = _model()
+    original_page, original_preview = np.array(model.page), np.array(model.preview)
+
+    page, preview = _full_render(model)
+
+    assert np.array_equal(page, original_page)
+    assert np.array_equal(preview, original_preview)
+
+
+def test_merge_regions_updates_only_source_area():
+    model = _model()
+    island = model.component_at(10, 30)
+    left = model.component_at(0, 0)
+
+    result = merge_regions(model, island, left)
+
+    y0, x0, y1, x1 = result.preview_box
+    assert (y0, x0, y1, x1) == (20, 5, 40, 20)
+    assert model.region_count == 3
+    assert np.all(np.array(model.preview)[25, 10] == PALETTE[0])
+    page, preview = _full_render(model)
+    assert np.array_equal(np.array(model.page), page)
+    assert np.array_equal(np.array(model.preview), preview)
+
+
+def test_recolor_region_changes_preview_and_number():
+    model = _model()
+    island = model.component_at(10, 30)
+    before = np.array(model.page)
+
+    result = recolor_region(model, island, 1)
+
+    assert np.all(np.array(model.preview)[25, 10] == PALETTE[1])
+    assert result.page_box is not None
+    assert not np.array_equal(np.array(model.page), before)
+    page, _ = _full_render(model)
+    assert np.array_equal(np.array(model.page), page)
+
+
+def test_merge_regions_rejects_non_adjacent():
+    model = _model()
+
+    try:
+        merge_regions(model, model.component_at(10, 30), model.component_at(80, 0))
+    except ValueError as exc:
+        assert "adjacent" in str(exc)
+    else:
+        assert False, "Expected ValueError"
+
+
+def test_merge_regions_drops_every_number_of_the_source():
+    labels = np.zeros((120, 300), dtype=int)
+    labels[:, 150:] = 1
+    layout = layout_numbers(labels, spacing=60)
+    page = render_numbered_outline(labels, mode="L", layout=layout)
+    preview = render_painted_preview(labels, PALETTE)
+    model = build_region_model(labels, PALETTE, page, preview, layout=layout)
+    right = model.component_at(200, 0)
+    assert np.count_nonzero(model.anchors[:, 0] == right) > 1
+
+    merge_regions(model, right, model.component_at(0, 0))
+
+    assert not np.any(model.anchors[:, 0] == right)
+    page, preview = _full_render(model)
+    assert np.array_equal(np.array(model.page), page)
@@ -1,7 +1,12 @@
 import numpy as np
 
 from app.services.image_pipeline.regions import (
+    choose_min_region_size,
+    count_regions,
+    label_components,
+    merge_components,
     merge_small_regions,
+    merge_small_regions_counted,
     find_regions,
     region_label_position,
 )
@@ -49,3 +54,99 @@ def test_find_regions_and_label_position():
     for region in regions:
         y, x = region_label_position(labels, region)
         assert labels[y, x] == region.label
+
+
+def test_merge_small_regions_counted_reports_stats():
+    labels = np.array(
+        [
+            [0, 0, 0, 2],
+            [0, 1, 0, 2],
+            [0, 0, 0, 2],
+        ]
+    )
+
+    merged, stats = merge_small_regions_counted(labels, min_size=2)
+
+    assert stats.components == 3
+    assert stats.merged == 1
+    assert np.array_equal(merged, merge_small_regions(labels, min_size=2))
+
+
+def test_label_components_numbers_regions_in_raster_order():
+    labels = np.array(
+        [
+            [0, 0, 1],
+            [2, 0, 1],
+            [2, 2, 0],
+        ]
+    )
+
+    components, sizes = label_components(labels)
+
+    assert components.tolist() == [[0, 0, 1], [2, 0, 1], [2, 2, 3]]
+    assert sizes.tolist() == [3, 2, 3, 1]
+
+
+def test_choose_min_region_size_meets_budget():
+    sizes = np.array([50, 3, 3, 10, 1])
+
+    assert choose_min_region_size(sizes, 5) == 0
+    assert choose_min_region_size(sizes, 2) == 4
+    assert choose_min_region_size(sizes, 3) == 4  # ties at 3 cannot be split
+    assert choose_min_region_size(sizes, 1) == 11
+
+
+def test_merge_components_folds_small_components_into_neighbors():
+    labels = np.array(
+        [
+            [0, 0, 0, 2, 2],
+            [0, 1, 0, 2, 1],
+            [0, 0, 0, 2, 2],
+            [3, 3, 0, 0, 0],
+        ]
+    )
+    components, sizes = label_components(labels)
+
+    merged, stats = merge_components(labels, components, sizes, min_size=3)
+
+    assert np.array_equal(merged, merge_small_regions(labels, min_size=3))
+    assert stats.components == 5
+    assert stats.merged == 3
+    assert count_regions(merged, components) == 2
+
+
+def test_merge_components_carries_chained_merges_along():
+    labels = np.array([[1, 2, 0, 0, 0, 0]])
+    components, sizes = label_components(labels)
+
+    merged, stats = merge_components(labels, components, sizes, min_size=3)
+
+    assert merged.tolist() == [[0, 0, 0, 0, 0, 0]]
+    assert stats.merged == 2
+    assert count_regions(merged, components) == 1
+
+
+def test_merge_components_joins_groups_of_small_components():
+    for labels in ([[2, 2, 0, 0], [1, 2, 1, 0], [1, 2, 0, 0]], [[1, 0, 1, 0], [2, 2, 0, 1]]):
+        labels = np.array(labels)
+        components, sizes = label_components(labels)
+        threshold = choose_min_region_size(sizes, 1)
+
+        merged, _ = merge_components(labels, components, sizes, threshold)
+
+        assert len(find_regions(merged)) == 1
+
+
+def test_merge_components_meets_region_budget_on_noise():
+    rng = np.random.default_rng(7)
+    for _ in range(200):
+        height, width = rng.integers(2, 12, size=2)
+        labels = rng.integers(0, rng.integers(2, 6), size=(height, width))
+        max_regions = int(rng.integers(1, 8))
+        components, sizes = label_components(labels)
+        threshold = choose_min_region_size(sizes, max_regions)
+
+        merged, _ = merge_components(labels, components, sizes, threshold)
+
+        assert len(find_regions(merged)) <= max_regions
+        assert count_regions(merged, components) == len(find_regions(merged))
@@ -0,0 +1,29 @@
+import numpy as np
+from PIL import Image
+
+from app.services.image_pipeline.superpixels import slic_superpixels
+
+
+def test_slic_superpixels_follow_color_edges():
+    image = Image.new("RGB", (50, 30), (250, 250, 250))
+    image.paste((200, 20, 20), (0, 0, 23, 30))
+
+    segments, means, counts = slic_superpixels(image, step=10)
+
+    assert segments.shape == (30, 50)
+    assert segments.min() == 0 and segments.max() == len(means) - 1
+    assert counts.sum() == 50 * 30
+    assert np.all(counts > 0)
+    # No superpixel straddles the vertical edge at x=23.
+    left, right = set(segments[:, :23].ravel()), set(segments[:, 23:].ravel())
+    assert not left & right
+    assert np.allclose(means[segments[0, 0]], (200, 20, 20))
+
+
+def test_slic_superpixels_rejects_tiny_step():
+    try:
+        slic_superpixels(Image.new("RGB", (4, 4)), step=1)
+    except ValueError as exc:
+        assert "step" in str(exc)
+    else:
+        assert False, "Expected ValueError"